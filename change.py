@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Two-date change detection with fused, tiled index differencing
+
+The chosen index is evaluated for both dates and differenced tile by tile,
+so only tile-sized temporaries exist and the change raster (and optional
+change mask) can be written straight to disk.
+
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .streaming import resolve_index, select_bands, iter_index_tiles
+
+ChangeResult = namedtuple('ChangeResult',['change','mask','changed'])
+
+MODES = ('difference','delta','relative')
+DIRECTIONS = ('decrease','increase','both')
+
+# Change of one tile: 'difference' is after-before (dNDVI), 'delta' is
+# before-after (dNBR convention), 'relative' is (after-before)/|before|
+def change_values(before,after,mode='difference'):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        if mode == 'difference':
+            return np.subtract(after,before,out=after)
+        if mode == 'delta':
+            return np.subtract(before,after,out=before)
+        if mode == 'relative':
+            diff = np.subtract(after,before,out=after)
+            return np.divide(diff,np.abs(before,out=before),out=diff)
+    raise ValueError("mode must be one of %s" % (MODES,))
+
+# Threshold a change tile into a boolean change mask; `direction` is the
+# direction of the index between the dates ('decrease' is vegetation loss),
+# whatever the sign convention of `mode` (loss is positive for 'delta')
+def change_mask(change,threshold,direction='decrease',mode='difference'):
+    if direction in ('decrease','increase') and mode == 'delta':
+        direction = 'increase' if direction == 'decrease' else 'decrease'
+    if direction == 'decrease':
+        return change <= -abs(threshold)
+    if direction == 'increase':
+        return change >= abs(threshold)
+    if direction == 'both':
+        return np.abs(change) >= abs(threshold)
+    raise ValueError("direction must be one of %s" % (DIRECTIONS,))
+
+# Yield (window, change, mask) for each tile of a two-date scene
+def iter_change(index,before,after,mode='difference',threshold=None,direction='decrease',tile=512,dtype=np.float64,**params):
+    if mode not in MODES:
+        raise ValueError("mode must be one of %s" % (MODES,))
+    func = resolve_index(index)
+    shape = next(iter(select_bands(func,before).values())).shape
+    if next(iter(select_bands(func,after).values())).shape != shape:
+        raise ValueError("Both dates must have the same raster shape")
+    tiles = zip(iter_index_tiles(func,before,tile,dtype,params),
+                iter_index_tiles(func,after,tile,dtype,params,cite=False))
+    for (window, _, v0), (_, _, v1) in tiles:
+        v0 = np.asarray(v0,dtype=dtype)
+        v1 = np.asarray(v1,dtype=dtype)
+        change = change_values(v0,v1,mode)
+        mask = None if threshold is None else change_mask(change,threshold,direction,mode)
+        yield window, change, mask
+
+# Two-date change of an index written into `out` (and `mask_out` when a
+# threshold is given); both are allocated in memory if not supplied, or may
+# be numpy.memmap / other writable sliceable arrays to stream to disk
+def detect_change(index,before,after,out=None,mask_out=None,mode='difference',threshold=None,direction='decrease',tile=512,dtype=np.float64,**params):
+    shape = next(iter(select_bands(resolve_index(index),before).values())).shape
+    if out is None:
+        out = np.empty(shape,dtype=dtype)
+    if threshold is not None and mask_out is None:
+        mask_out = np.zeros(shape,dtype=bool)
+    changed = 0
+    for window, change, mask in iter_change(index,before,after,mode,threshold,direction,tile,dtype,**params):
+        out[window] = change
+        if mask is not None:
+            mask_out[window] = mask
+            changed += int(np.count_nonzero(mask))
+    return ChangeResult(out,mask_out,changed if threshold is not None else None)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Streaming Cloud-Optimized GeoTIFF writer for index products
+
+Index tiles are compressed as they arrive and overview levels are built
+incrementally from the tile stream (2x2 NaN-aware averaging), so a finished
+COG is produced in one pass without holding the full array or reading the
+output back. Optionally values are stored as int16 with a GDAL scale/offset.
+
+The file is laid out as GDAL's COG driver does: header and all IFDs first,
+then overview tiles from the smallest level up, then full-resolution tiles.
+To get that order while streaming, compressed tiles are spooled to
+temporary files next to the output and concatenated on close; this is a
+sequential byte copy, the raster is never decoded again.
+
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from .streaming import resolve_index, select_bands, iter_index_tiles
+
+# TIFF field types: ASCII, SHORT, LONG, DOUBLE, LONG8
+_TYPES = {2:'s',3:'H',4:'I',12:'d',16:'Q'}
+
+# Serialized IFD with its out-of-line values placed right after the entries
+def _ifd_bytes(entries,offset,next_ifd,big):
+    ptr = '<Q' if big else '<I'
+    inline = 8 if big else 4
+    fixed = (8 if big else 2) + len(entries)*(20 if big else 12) + inline
+    body = bytearray(struct.pack('<Q' if big else '<H',len(entries)))
+    extra = bytearray()
+    for tag, typ, values in sorted(entries):
+        if typ == 2:
+            data = values.encode('ascii')+b'\0'
+            count = len(data)
+        else:
+            data = struct.pack('<%d%s' % (len(values),_TYPES[typ]),*values)
+            count = len(values)
+        if len(data) <= inline:
+            field = data.ljust(inline,b'\0')
+        else:
+            field = struct.pack(ptr,offset+fixed+len(extra))
+            extra += data
+            if len(extra) % 2:
+                extra += b'\0'
+        body += struct.pack('<HHQ' if big else '<HHI',tag,typ,count)+field
+    body += struct.pack(ptr,next_ifd)
+    return bytes(body+extra)
+
+# Mean of 2x2 pixel blocks ignoring NaN (all-NaN blocks stay NaN)
+def downsample(tile):
+    h, w = tile.shape
+    q = tile.reshape(h//2,2,w//2,2)
+    finite = np.isfinite(q)
+    count = finite.sum(axis=(1,3))
+    total = np.where(finite,q,0.0).sum(axis=(1,3))
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.where(count > 0,total/count,np.nan).astype(np.float32)
+
+# GDAL geotransform (x0, dx, rx, y0, ry, dy) of a north-up `transform`,
+# given in that order or as an affine.Affine (e.g. rasterio's dataset.transform)
+def geotransform(transform):
+    if hasattr(transform,'to_gdal'):
+        transform = transform.to_gdal()
+    values = [float(v) for v in transform]
+    if len(values) == 9 and values[6:] == [0.0,0.0,1.0]:
+        a, b, c, d, e, f = values[:6]
+        values = [c,a,b,f,d,e]
+    if len(values) != 6:
+        raise ValueError("transform must be a GDAL geotransform (x0, dx, rx, y0, ry, dy) or an Affine")
+    x0, dx, rx, y0, ry, dy = values
+    if rx or ry:
+        raise ValueError("Only north-up transforms are supported")
+    if not dx or not dy:
+        raise ValueError("transform pixel size must be non-zero")
+    return tuple(values)
+
+# Streaming writer of a single-band tiled, compressed COG
+#
+# `transform` is a GDAL geotransform (x0, dx, rx, y0, ry, dy) or an Affine and
+# `epsg` an EPSG code; both are validated here, before any tile is written.
+# Windows passed to `write` must start on the block grid (e.g. from
+# streaming.iter_windows with tile=block or a multiple of it); they may
+# arrive in any order. Blocks never written are filled with nodata.
+class COGWriter:
+
+    def __init__(self,path,width,height,block=512,compress='deflate',level=6,scale=None,offset=0.0,
+                 transform=None,epsg=None,overviews=True,bigtiff=None):
+        if block % 16 or block <= 0:
+            raise ValueError("block size must be a positive multiple of 16")
+        if compress not in ('deflate',None):
+            raise ValueError("compress must be 'deflate' or None")
+        self.path = path
+        self.width = int(width)
+        self.height = int(height)
+        self.block = int(block)
+        self.compress = compress
+        self.level = level
+        self.scale = scale
+        self.offset = offset
+        self.transform = geotransform(transform) if transform is not None else None
+        if epsg is not None:
+            if not isinstance(epsg,(int,np.integer)) or not 0 < epsg < 32768:
+                raise ValueError("epsg must be an EPSG code, got %r" % (epsg,))
+            epsg = int(epsg)
+        self.epsg = epsg
+        self.bigtiff = bigtiff
+        self.nodata = -32768 if scale is not None else None
+        # Level sizes: full resolution first, then halved until one block
+        self.sizes = [(self.height,self.width)]
+        while overviews and max(self.sizes[-1]) > self.block:
+            h, w = self.sizes[-1]
+            self.sizes.append(((h+1)//2,(w+1)//2))
+        self.grids = [(-(-h//self.block),-(-w//self.block)) for h,w in self.sizes]
+        self.tiles = [{} for _ in self.sizes]
+        self.pending = [{} for _ in self.sizes]
+        directory = os.path.dirname(os.path.abspath(path))
+        self._spools = [tempfile.TemporaryFile(dir=directory) for _ in self.sizes]
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc,tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # Write index values for a block-aligned window
+    def write(self,window,values):
+        rows, cols = window
+        values = np.asarray(values,dtype=np.float32)
+        if rows.start % self.block or cols.start % self.block:
+            raise ValueError("window must start on the %d-pixel block grid" % self.block)
+        for r in range(0,values.shape[0],self.block):
+            for c in range(0,values.shape[1],self.block):
+                part = values[r:r+self.block,c:c+self.block]
+                self._put(0,(rows.start+r)//self.block,(cols.start+c)//self.block,part)
+
+    def _put(self,lvl,row,col,data):
+        if (row,col) in self.tiles[lvl]:
+            raise ValueError("block (%d, %d) of level %d written twice" % (row,col,lvl))
+        tile = np.full((self.block,self.block),np.nan,dtype=np.float32)
+        tile[:data.shape[0],:data.shape[1]] = data
+        spool = self._spools[lvl]
+        encoded = self._encode(tile)
+        self.tiles[lvl][(row,col)] = (spool.tell(),len(encoded))
+        spool.write(encoded)
+        if lvl+1 < len(self.sizes):
+            self._propagate(lvl+1,row,col,downsample(tile))
+
+    # Place a downsampled child into its parent and emit completed parents
+    def _propagate(self,lvl,row,col,half):
+        key = (row//2,col//2)
+        parent = self.pending[lvl].get(key)
+        if parent is None:
+            parent = [np.full((self.block,self.block),np.nan,dtype=np.float32),0]
+            self.pending[lvl][key] = parent
+        h = self.block//2
+        parent[0][(row%2)*h:(row%2)*h+h,(col%2)*h:(col%2)*h+h] = half
+        parent[1] += 1
+        rows, cols = self.grids[lvl-1]
+        expected = (min(2,rows-2*key[0]))*(min(2,cols-2*key[1]))
+        if parent[1] == expected:
+            del self.pending[lvl][key]
+            self._put(lvl,key[0],key[1],parent[0])
+
+    def _encode(self,tile):
+        if self.scale is not None:
+            with np.errstate(invalid='ignore'):
+                v = np.round((tile-self.offset)/self.scale)
+            v = np.where(np.isfinite(v),np.clip(v,-32767,32767),self.nodata).astype('<i2')
+            if self.compress:
+                d = v.copy()
+                d[:,1:] = v[:,1:]-v[:,:-1]
+                v = d
+            raw = v.tobytes()
+        elif self.compress:
+            # Floating point predictor: byte planes per row, then differences
+            b = tile.astype('>f4').view(np.uint8).reshape(self.block,self.block,4)
+            b = np.ascontiguousarray(b.transpose(0,2,1)).reshape(self.block,4*self.block)
+            d = b.copy()
+            d[:,1:] = b[:,1:]-b[:,:-1]
+            raw = d.tobytes()
+        else:
+            raw = tile.astype('<f4').tobytes()
+        return zlib.compress(raw,self.level) if self.compress else raw
+
+    def _entries(self,lvl,offsets,counts,big):
+        h, w = self.sizes[lvl]
+        int16 = self.scale is not None
+        entries = [
+            (254,4,[0 if lvl == 0 else 1]),
+            (256,4,[w]),
+            (257,4,[h]),
+            (258,3,[16 if int16 else 32]),
+            (259,3,[8 if self.compress else 1]),
+            (262,3,[1]),
+            (277,3,[1]),
+            (284,3,[1]),
+            (322,3,[self.block]),
+            (323,3,[self.block]),
+            (324,16 if big else 4,offsets),
+            (325,4,counts),
+            (339,3,[2 if int16 else 3]),
+            (42113,2,str(self.nodata) if int16 else 'nan'),
+        ]
+        if self.compress:
+            entries.append((317,3,[2 if int16 else 3]))
+        if lvl == 0:
+            if int16:
+                entries.append((42112,2,'<GDALMetadata>'
+                                '<Item name="OFFSET" sample="0" role="offset">%r</Item>'
+                                '<Item name="SCALE" sample="0" role="scale">%r</Item>'
+                                '</GDALMetadata>' % (float(self.offset),float(self.scale))))
+            if self.transform is not None:
+                x0, dx, rx, y0, ry, dy = self.transform
+                entries.append((33550,12,[float(dx),float(-dy),0.0]))
+                entries.append((33922,12,[0.0,0.0,0.0,float(x0),float(y0),0.0]))
+            if self.epsg is not None:
+                geographic = 4000 <= self.epsg < 5000
+                entries.append((34735,3,[1,1,0,3,
+                                         1024,0,1,2 if geographic else 1,
+                                         1025,0,1,1,
+                                         2048 if geographic else 3072,0,1,self.epsg]))
+        return entries
+
+    # Fill unwritten blocks, assemble the COG and remove the spools
+    def close(self):
+        if self._closed:
+            return
+        rows, cols = self.grids[0]
+        for r in range(rows):
+            for c in range(cols):
+                if (r,c) not in self.tiles[0]:
+                    self._put(0,r,c,np.empty((0,0),dtype=np.float32))
+        order = list(range(len(self.sizes)-1,-1,-1))
+        spool_size = [s.seek(0,os.SEEK_END) for s in self._spools]
+        big = self.bigtiff
+        if big is None:
+            big = sum(spool_size) > 2**32 - 2**26
+        header = 16 if big else 8
+        ntiles = [g[0]*g[1] for g in self.grids]
+        # IFD sizes do not depend on the offset values, so lay out first
+        ifd_sizes = [len(_ifd_bytes(self._entries(l,[0]*n,[0]*n,big),0,0,big))
+                     for l,n in enumerate(ntiles)]
+        ifd_pos = []
+        pos = header
+        for size in ifd_sizes:
+            ifd_pos.append(pos)
+            pos += size
+        data_pos = {}
+        for lvl in order:
+            data_pos[lvl] = pos
+            pos += spool_size[lvl]
+        try:
+            with open(self.path,'wb') as f:
+                if big:
+                    f.write(b'II'+struct.pack('<HHHQ',43,8,0,header))
+                else:
+                    f.write(b'II'+struct.pack('<HI',42,header))
+                for lvl in range(len(self.sizes)):
+                    offsets, counts = [], []
+                    for r in range(self.grids[lvl][0]):
+                        for c in range(self.grids[lvl][1]):
+                            off, count = self.tiles[lvl][(r,c)]
+                            offsets.append(data_pos[lvl]+off)
+                            counts.append(count)
+                    nxt = ifd_pos[lvl+1] if lvl+1 < len(self.sizes) else 0
+                    f.write(_ifd_bytes(self._entries(lvl,offsets,counts,big),ifd_pos[lvl],nxt,big))
+                for lvl in order:
+                    spool = self._spools[lvl]
+                    spool.seek(0)
+                    shutil.copyfileobj(spool,f,16*1024*1024)
+        finally:
+            self.abort()
+
+    # Discard spooled data without writing the output
+    def abort(self):
+        for spool in self._spools:
+            spool.close()
+        self._closed = True
+
+# Compute an index tile by tile straight into a COG; `transform` is a GDAL
+# geotransform (x0, dx, rx, y0, ry, dy) or an Affine, and a qa.IndexQA passed
+# as `qa` range-checks the tiles as they are written
+def write_cog(index,bands,path,block=512,scale=None,offset=0.0,transform=None,epsg=None,
+              compress='deflate',level=6,dtype=np.float32,qa=None,**params):
+    func = resolve_index(index)
+    height, width = next(iter(select_bands(func,bands).values())).shape[:2]
+    with COGWriter(path,width,height,block,compress,level,scale,offset,transform,epsg) as writer:
+        for window, tile_bands, values in iter_index_tiles(func,bands,block,dtype,params):
+            if qa is not None:
+                qa.update(values,tile_bands,params)
+            writer.write(window,values)
+    return path
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Tiled, multi-threaded neighborhood filtering of index rasters
+
+Each tile is read together with a halo wide enough for the neighborhood, so
+the tiled result matches filtering the whole raster at once (exactly for
+median and morphology, to rounding for the box filters) while only
+tile-sized blocks are held in memory. Sources are sliceable 2-D arrays,
+e.g. the numpy.memmap written by ``streaming.stream_index``.
+
+Index rasters are NaN wherever their denominator is zero, so ``median``,
+``mean`` and ``local_std`` treat NaN/inf pixels as missing: they are ignored
+in every neighborhood (normalized convolution for mean and std), stay NaN in
+the output, and pixels with no finite neighbor become NaN. On finite input
+the results equal scipy.ndimage's. The 'wrap' boundary mode is not
+supported, as a tile halo cannot reach the opposite edge of the raster.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import ndimage
+
+from .streaming import iter_windows
+
+# Halo (rows, cols) needed by a neighborhood of the given size
+def filter_halo(size):
+    if np.isscalar(size):
+        size = (size,size)
+    return (int(size[0])//2,int(size[1])//2)
+
+# Apply `func` to every tile of `source` read with a `halo` border and write
+# the cropped result into `out`; tiles are processed by `workers` threads
+def apply_filter(source,func,halo,out=None,tile=512,workers=None,dtype=None):
+    shape = source.shape
+    if np.isscalar(halo):
+        halo = (halo,halo)
+    if out is None:
+        out = np.empty(shape,dtype=dtype or source.dtype)
+
+    def run(window):
+        rows, cols = window
+        r0 = max(rows.start-halo[0],0)
+        r1 = min(rows.stop+halo[0],shape[0])
+        c0 = max(cols.start-halo[1],0)
+        c1 = min(cols.stop+halo[1],shape[1])
+        result = func(np.asarray(source[r0:r1,c0:c1]))
+        out[window] = result[rows.start-r0:rows.stop-r0,cols.start-c0:cols.stop-c0]
+
+    with ThreadPoolExecutor(workers) as executor:
+        for _ in executor.map(run,iter_windows(shape,tile)):
+            pass
+    return out
+
+# numpy.pad equivalents of the supported scipy.ndimage boundary modes
+_PAD_MODES = {'reflect':'symmetric','mirror':'reflect','nearest':'edge','constant':'constant'}
+
+def _check_mode(mode):
+    if mode not in _PAD_MODES:
+        raise ValueError("mode must be one of %s" % (sorted(_PAD_MODES),))
+
+# Median of the finite values in each neighborhood (upper median for an even
+# count, as scipy.ndimage.median_filter); all-missing neighborhoods are NaN
+def _nan_median(a,size,mode):
+    if np.isscalar(size):
+        size = (size,size)
+    pad = [(s//2,s-1-s//2) for s in size]
+    windows = sliding_window_view(np.pad(a,pad,mode=_PAD_MODES[mode]),tuple(size))
+    windows = np.sort(windows.reshape(a.shape+(-1,)),axis=-1)
+    count = np.count_nonzero(~np.isnan(windows),axis=-1)
+    mid = np.minimum(count//2,windows.shape[-1]-1)
+    result = np.take_along_axis(windows,mid[...,None],axis=-1)[...,0]
+    return np.where(count > 0,result,np.nan)
+
+# Median smoothing
+def median(source,size=3,out=None,tile=512,workers=None,mode='reflect'):
+    _check_mode(mode)
+    def func(a):
+        if a.dtype.kind != 'f':
+            return ndimage.median_filter(a,size=size,mode=mode)
+        finite = np.isfinite(a)
+        if finite.all():
+            return ndimage.median_filter(a,size=size,mode=mode)
+        result = _nan_median(np.where(finite,a,np.nan),size,mode)
+        result[~finite] = np.nan
+        return result
+    return apply_filter(source,func,filter_halo(size),out,tile,workers)
+
+# Box means of the values and their squares over finite pixels, with the
+# finite mask (normalized convolution; plain box filter on finite input)
+def _nan_moments(a,size,mode,squares=False):
+    a = np.asarray(a,dtype=np.float64)
+    finite = np.isfinite(a)
+    if finite.all():
+        m = ndimage.uniform_filter(a,size=size,mode=mode)
+        m2 = ndimage.uniform_filter(a*a,size=size,mode=mode) if squares else None
+        return m, m2, finite
+    v = np.where(finite,a,0.0)
+    w = ndimage.uniform_filter(finite.astype(np.float64),size=size,mode=mode,cval=1.0)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        m = np.where(w > 0,ndimage.uniform_filter(v,size=size,mode=mode)/w,np.nan)
+        m2 = np.where(w > 0,ndimage.uniform_filter(v*v,size=size,mode=mode)/w,np.nan) if squares else None
+    m[~finite] = np.nan
+    return m, m2, finite
+
+# Mean (box) smoothing
+def mean(source,size=3,out=None,tile=512,workers=None,mode='reflect'):
+    _check_mode(mode)
+    def func(a):
+        return _nan_moments(a,size,mode)[0]
+    return apply_filter(source,func,filter_halo(size),out,tile,workers,np.float64)
+
+# Texture as local standard deviation
+def local_std(source,size=3,out=None,tile=512,workers=None,mode='reflect'):
+    _check_mode(mode)
+    def func(a):
+        m, m2, _ = _nan_moments(a,size,mode,squares=True)
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(np.maximum(m2-m*m,0.0))
+    return apply_filter(source,func,filter_halo(size),out,tile,workers,np.float64)
+
+# Halo of a binary morphology chain of `steps` operations of `iterations` each
+def _morphology_halo(structure,iterations,steps):
+    if structure is None:
+        radius = (1,1)
+    else:
+        radius = filter_halo(np.shape(structure))
+    return (radius[0]*iterations*steps,radius[1]*iterations*steps)
+
+# Morphological opening of a mask (removes small speckles)
+def opening(mask,iterations=1,structure=None,out=None,tile=512,workers=None):
+    def func(a):
+        return ndimage.binary_opening(a,structure=structure,iterations=iterations)
+    return apply_filter(mask,func,_morphology_halo(structure,iterations,2),out,tile,workers,bool)
+
+# Morphological closing of a mask (fills small holes)
+def closing(mask,iterations=1,structure=None,out=None,tile=512,workers=None):
+    def func(a):
+        return ndimage.binary_closing(a,structure=structure,iterations=iterations)
+    return apply_filter(mask,func,_morphology_halo(structure,iterations,2),out,tile,workers,bool)
+
+# Morphological erosion of a mask
+def erosion(mask,iterations=1,structure=None,out=None,tile=512,workers=None):
+    def func(a):
+        return ndimage.binary_erosion(a,structure=structure,iterations=iterations)
+    return apply_filter(mask,func,_morphology_halo(structure,iterations,1),out,tile,workers,bool)
+
+# Morphological dilation of a mask
+def dilation(mask,iterations=1,structure=None,out=None,tile=512,workers=None):
+    def func(a):
+        return ndimage.binary_dilation(a,structure=structure,iterations=iterations)
+    return apply_filter(mask,func,_morphology_halo(structure,iterations,1),out,tile,workers,bool)
+
+# Lazy thresholded view of an index raster, sliceable like the source, so
+# masks can be cleaned up without writing them out first
+class ThresholdSource:
+
+    def __init__(self,source,threshold,above=True):
+        self.source = source
+        self.threshold = threshold
+        self.above = above
+        self.shape = source.shape
+        self.dtype = np.dtype(bool)
+
+    def __getitem__(self,key):
+        values = np.asarray(self.source[key])
+        with np.errstate(invalid='ignore'):
+            if self.above:
+                return values >= self.threshold
+            return values < self.threshold
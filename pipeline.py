@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Asyncio pipeline overlapping band reading, index math and writing
+
+Reader, compute and writer stages run concurrently over tiles of a list of
+scenes and are connected by bounded queues, so a slow stage applies
+backpressure instead of buffering whole scenes. Reads and writes run in an
+I/O thread pool; index math runs in a thread or process pool. Each stage
+records busy, starved (waiting for input) and blocked (waiting for room
+downstream) time, which shows where the bottleneck is.
+
+"""
+
+import asyncio
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .streaming import BAND_NAMES, iter_windows, resolve_index, index_bands, evaluate_index, cite_index
+from .qa import IndexQA
+
+PipelineResult = namedtuple('PipelineResult',['outputs','stats','elapsed','qa'])
+
+# In-memory output of one (scene, index); any object with the same
+# write(window, values) / close() methods can be used as a sink, e.g.
+# lambda scene,index,shape: cog.COGWriter(...)
+class ArraySink:
+
+    def __init__(self,scene,index,shape,dtype=np.float32):
+        self.scene = scene
+        self.index = index
+        self.data = np.empty(shape,dtype=dtype)
+
+    def write(self,window,values):
+        self.data[window] = values
+
+    def close(self):
+        pass
+
+# Timing counters of one pipeline stage
+class StageStats:
+
+    def __init__(self,name,concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self.elapsed = 0.0
+
+    # Fraction of the stage's worker time spent doing work
+    @property
+    def utilization(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.busy/(self.elapsed*self.concurrency)
+
+    def as_dict(self):
+        return {'items':self.items,'concurrency':self.concurrency,'busy':self.busy,
+                'starved':self.starved,'blocked':self.blocked,'utilization':self.utilization}
+
+    def __repr__(self):
+        return ('StageStats(%s: %d items, utilization %.0f%%, starved %.2fs, blocked %.2fs)' %
+                (self.name,self.items,100*self.utilization,self.starved,self.blocked))
+
+# Stage with the highest utilization
+def bottleneck(stats):
+    return max(stats.values(),key=lambda s:s.utilization).name
+
+def _read_tile(bands,names,window,dtype):
+    return {n:np.asarray(bands[n][window],dtype=dtype) for n in names}
+
+# Compute several indices on one tile, with their QA counters when asked
+# (module level so it can be pickled for a process pool)
+def _compute_tile(funcs,tile,params,dtype,qa=False):
+    out = {}
+    checks = {}
+    for func in funcs:
+        name = func.__name__
+        bands = {b:tile[b] for b in index_bands(func)}
+        values = evaluate_index(func,bands,params.get(name))
+        if qa:
+            checks[name] = IndexQA(name).update(values,bands,params.get(name))
+        out[name] = np.asarray(values,dtype=dtype)
+    return out, checks
+
+def _write_tile(sinks,scene,window,values):
+    for name, data in values.items():
+        sinks[(scene,name)].write(window,data)
+
+# Run the pipeline inside a running event loop
+#
+# `scenes` maps scene names to band sources (dicts of sliceable 2-D arrays),
+# `indices` lists Npvi index names or index functions (custom functions take
+# bands named as in streaming.BAND_NAMES and, for the process executor, must
+# be defined at module level), `params` optionally maps index names to
+# keyword arguments, and `sink(scene,index,shape)` creates each output.
+# With `qa`, each index is range-checked in the compute stage and the
+# merged qa.IndexQA counters are returned per (scene, index).
+async def run_pipeline_async(scenes,indices,sink=None,params=None,tile=512,queue_size=8,
+                             readers=2,workers=None,executor='thread',dtype=np.float32,qa=False):
+    loop = asyncio.get_running_loop()
+    scenes = list(scenes.items()) if isinstance(scenes,dict) else list(scenes)
+    funcs = [resolve_index(i) for i in indices]
+    names = [f.__name__ for f in funcs]
+    for func in funcs:
+        if not index_bands(func):
+            raise ValueError("Index %s takes none of the bands %s" % (func.__name__,BAND_NAMES))
+    if len(set(names)) != len(names):
+        raise ValueError("Index names must be unique, got %s" % (names,))
+    params = params or {}
+    needed = sorted(set(b for f in funcs for b in index_bands(f)))
+    workers = workers or os.cpu_count() or 1
+    if executor not in ('thread','process'):
+        raise ValueError("executor must be 'thread' or 'process'")
+
+    # Print each citation once on this thread; workers use the pure forms
+    for func in funcs:
+        cite_index(func,params.get(func.__name__))
+
+    if sink is None:
+        sink = ArraySink
+    sinks = {}
+    checks = {}
+    jobs = []
+    for scene, bands in scenes:
+        missing = set(needed)-set(bands)
+        if missing:
+            raise ValueError("Scene %r lacks bands %s" % (scene,sorted(missing)))
+        shape = bands[needed[0]].shape
+        for name in names:
+            sinks[(scene,name)] = sink(scene,name,shape)
+            if qa:
+                checks[(scene,name)] = IndexQA(name)
+        jobs.extend((scene,bands,window) for window in iter_windows(shape,tile))
+    jobs = iter(jobs)
+
+    stats = {'read':StageStats('read',readers),'compute':StageStats('compute',workers),
+             'write':StageStats('write',1)}
+    read_q = asyncio.Queue(queue_size)
+    write_q = asyncio.Queue(queue_size)
+    io_pool = ThreadPoolExecutor(readers+1)
+    cpu_pool = ProcessPoolExecutor(workers) if executor == 'process' else ThreadPoolExecutor(workers)
+
+    async def put(queue,item,stage):
+        t = time.perf_counter()
+        await queue.put(item)
+        stage.blocked += time.perf_counter()-t
+
+    async def get(queue,stage):
+        t = time.perf_counter()
+        item = await queue.get()
+        stage.starved += time.perf_counter()-t
+        return item
+
+    async def reader():
+        stage = stats['read']
+        for scene, bands, window in jobs:
+            t = time.perf_counter()
+            data = await loop.run_in_executor(io_pool,_read_tile,bands,needed,window,dtype)
+            stage.busy += time.perf_counter()-t
+            stage.items += 1
+            await put(read_q,(scene,window,data),stage)
+
+    async def read_all():
+        await asyncio.gather(*[reader() for _ in range(readers)])
+        for _ in range(workers):
+            await read_q.put(None)
+
+    async def compute():
+        stage = stats['compute']
+        while True:
+            item = await get(read_q,stage)
+            if item is None:
+                return
+            scene, window, data = item
+            t = time.perf_counter()
+            values, tile_checks = await loop.run_in_executor(cpu_pool,_compute_tile,funcs,data,params,dtype,qa)
+            stage.busy += time.perf_counter()-t
+            for name, check in tile_checks.items():
+                checks[(scene,name)].merge(check)
+            stage.items += 1
+            await put(write_q,(scene,window,values),stage)
+
+    async def compute_all():
+        await asyncio.gather(*[compute() for _ in range(workers)])
+        await write_q.put(None)
+
+    async def writer():
+        stage = stats['write']
+        while True:
+            item = await get(write_q,stage)
+            if item is None:
+                return
+            t = time.perf_counter()
+            await loop.run_in_executor(io_pool,_write_tile,sinks,*item)
+            stage.busy += time.perf_counter()-t
+            stage.items += 1
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(c) for c in (read_all(),compute_all(),writer())]
+    try:
+        await asyncio.gather(*tasks)
+        for out in sinks.values():
+            await loop.run_in_executor(io_pool,out.close)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        for out in sinks.values():
+            abort = getattr(out,'abort',None)
+            if abort is not None:
+                abort()
+        raise
+    finally:
+        io_pool.shutdown(wait=True)
+        cpu_pool.shutdown(wait=True)
+    elapsed = time.perf_counter()-start
+    for stage in stats.values():
+        stage.elapsed = elapsed
+    return PipelineResult(sinks,stats,elapsed,checks if qa else None)
+
+# Run the pipeline to completion in a new event loop
+def run_pipeline(scenes,indices,sink=None,params=None,tile=512,queue_size=8,
+                 readers=2,workers=None,executor='thread',dtype=np.float32,qa=False):
+    return asyncio.run(run_pipeline_async(scenes,indices,sink,params,tile,queue_size,
+                                          readers,workers,executor,dtype,qa))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Range-checking QA counters fused into index computation
+
+An IndexQA is updated with each computed tile (and the bands it came from)
+and counts NaN, +inf/-inf and out-of-range pixels of the index, plus pixels
+where one of the index's sensitive denominators is near zero (see
+vegetation_indices.INDEX_INFO). Counters are mergeable, so the QA report of
+a scene comes out of the computation pass itself instead of a separate
+validation pass over the product.
+
+"""
+
+import numpy as np
+
+from .vegetation_indices import INDEX_INFO
+
+# QA counters of one index
+class IndexQA:
+
+    def __init__(self,index,valid_range=None,eps=1e-3):
+        self.index = getattr(index,'__name__',index)
+        info = INDEX_INFO.get(self.index)
+        if valid_range is None:
+            if info is None:
+                raise ValueError("No valid range known for index %r" % (self.index,))
+            valid_range = info.valid_range
+        self.valid_range = (float(valid_range[0]),float(valid_range[1]))
+        self.eps = eps
+        self.pixels = 0
+        self.nan = 0
+        self.posinf = 0
+        self.neginf = 0
+        self.below = 0
+        self.above = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.denominators = {expr:0 for expr,_ in (info.denominators if info else ())}
+
+    # Count one tile of index values; `bands` and `params` are the index
+    # inputs used to check its sensitive denominators
+    def update(self,values,bands=None,params=None):
+        values = np.asarray(values)
+        self.pixels += int(values.size)
+        nan = np.isnan(values)
+        self.nan += int(np.count_nonzero(nan))
+        self.posinf += int(np.count_nonzero(values == np.inf))
+        self.neginf += int(np.count_nonzero(values == -np.inf))
+        finite = values[np.isfinite(values)]
+        if finite.size:
+            self.below += int(np.count_nonzero(finite < self.valid_range[0]))
+            self.above += int(np.count_nonzero(finite > self.valid_range[1]))
+            self.min = min(self.min,float(finite.min()))
+            self.max = max(self.max,float(finite.max()))
+        if bands is not None and self.denominators:
+            params = params or {}
+            with np.errstate(divide='ignore',invalid='ignore'):
+                for expr, func in INDEX_INFO[self.index].denominators:
+                    d = np.asarray(func(**bands,**params))
+                    self.denominators[expr] += int(np.count_nonzero(np.abs(d) < self.eps))
+        return self
+
+    def merge(self,other):
+        if other.index != self.index:
+            raise ValueError("Cannot merge QA of %r and %r" % (self.index,other.index))
+        self.pixels += other.pixels
+        self.nan += other.nan
+        self.posinf += other.posinf
+        self.neginf += other.neginf
+        self.below += other.below
+        self.above += other.above
+        self.min = min(self.min,other.min)
+        self.max = max(self.max,other.max)
+        for expr, count in other.denominators.items():
+            self.denominators[expr] = self.denominators.get(expr,0) + count
+        return self
+
+    # Pixels that are NaN, infinite or outside the valid range
+    @property
+    def invalid(self):
+        return self.nan + self.posinf + self.neginf + self.below + self.above
+
+    @property
+    def ok(self):
+        return self.invalid == 0
+
+    # Compact QA report as a plain dict
+    def report(self):
+        return {'index':self.index,'pixels':self.pixels,'invalid':self.invalid,
+                'invalid_fraction':self.invalid/self.pixels if self.pixels else 0.0,
+                'nan':self.nan,'posinf':self.posinf,'neginf':self.neginf,
+                'below_range':self.below,'above_range':self.above,
+                'valid_range':self.valid_range,
+                'min':self.min if self.min <= self.max else None,
+                'max':self.max if self.min <= self.max else None,
+                'near_zero_denominators':dict(self.denominators)}
+
+    def __repr__(self):
+        return 'IndexQA(%s: %d/%d invalid, nan=%d, inf=%d, out of range=%d)' % (
+            self.index,self.invalid,self.pixels,self.nan,self.posinf+self.neginf,self.below+self.above)
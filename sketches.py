@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Mergeable streaming histograms and quantile sketches for index rasters
+
+Sketches are updated tile by tile and hold only a fixed amount of state,
+so percentiles and histograms of continental mosaics can be computed
+without the full index array. Sketches from several worker processes are
+combined with ``merge`` (they are plain picklable objects).
+
+"""
+
+import numpy as np
+
+from .vegetation_indices import INDEX_INFO
+from .streaming import resolve_index, iter_index_tiles
+
+# Valid range of each index (see vegetation_indices.INDEX_INFO)
+INDEX_RANGES = {name:info.valid_range for name,info in INDEX_INFO.items()}
+
+# Fixed-range histogram with underflow/overflow and NaN/inf counters
+class FixedHistogram:
+
+    def __init__(self,lo,hi,bins=1024):
+        if not hi > lo:
+            raise ValueError("Histogram range must satisfy lo < hi")
+        self.lo = float(lo)
+        self.hi = float(hi)
+        self.bins = int(bins)
+        self.counts = np.zeros(self.bins,dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self.nonfinite = 0
+
+    # Histogram over the known valid range of an index
+    @classmethod
+    def for_index(cls,index,bins=1024):
+        name = getattr(index,'__name__',index)
+        if name not in INDEX_RANGES:
+            raise ValueError("No valid range known for index %r" % (name,))
+        lo, hi = INDEX_RANGES[name]
+        return cls(lo,hi,bins)
+
+    @property
+    def edges(self):
+        return np.linspace(self.lo,self.hi,self.bins+1)
+
+    @property
+    def total(self):
+        return int(self.counts.sum()) + self.underflow + self.overflow
+
+    def update(self,values):
+        values = np.asarray(values,dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        self.nonfinite += int(values.size - np.count_nonzero(finite))
+        values = values[finite]
+        self.underflow += int(np.count_nonzero(values < self.lo))
+        self.overflow += int(np.count_nonzero(values > self.hi))
+        inside = values[(values >= self.lo) & (values <= self.hi)]
+        idx = ((inside - self.lo)*(self.bins/(self.hi-self.lo))).astype(np.intp)
+        np.minimum(idx,self.bins-1,out=idx)
+        self.counts += np.bincount(idx,minlength=self.bins)
+        return self
+
+    def merge(self,other):
+        if (other.lo,other.hi,other.bins) != (self.lo,self.hi,self.bins):
+            raise ValueError("Cannot merge histograms with different binning")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.nonfinite += other.nonfinite
+        return self
+
+    # Quantile(s) in [0, 1] by linear interpolation inside bins
+    # (under/overflow mass is clamped to the range limits)
+    def quantile(self,q):
+        q = np.asarray(q,dtype=np.float64)
+        total = self.total
+        if total == 0:
+            return np.full(q.shape,np.nan)[()]
+        cdf = np.concatenate(([self.underflow],self.underflow+np.cumsum(self.counts)))
+        return np.interp(q*total,cdf,self.edges)[()]
+
+# Merging t-digest quantile sketch (Dunning and Ertl, 2019)
+#
+# Tiles are absorbed in a vectorized merge: incoming values and existing
+# centroids are sorted together and regrouped so that each centroid spans at
+# most one unit of the arcsine scale function k1, which keeps the tails of
+# the distribution (2/98 percentiles) accurate.
+class TDigest:
+
+    def __init__(self,compression=200):
+        self.compression = float(compression)
+        self.means = np.empty(0,dtype=np.float64)
+        self.weights = np.empty(0,dtype=np.float64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self,values):
+        values = np.asarray(values,dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return self
+        self.min = min(self.min,float(values.min()))
+        self.max = max(self.max,float(values.max()))
+        self._compress(np.concatenate((self.means,values)),
+                       np.concatenate((self.weights,np.ones(values.size))))
+        return self
+
+    def merge(self,other):
+        if other.weights.size:
+            self.min = min(self.min,other.min)
+            self.max = max(self.max,other.max)
+            self._compress(np.concatenate((self.means,other.means)),
+                           np.concatenate((self.weights,other.weights)))
+        return self
+
+    def _compress(self,means,weights):
+        order = np.argsort(means,kind='stable')
+        means = means[order]
+        weights = weights[order]
+        cum = np.cumsum(weights)
+        total = cum[-1]
+        q = np.clip((cum - 0.5*weights)/total,0.0,1.0)
+        k = self.compression/(2*np.pi)*np.arcsin(2*q-1)
+        group = np.floor(k - k[0]).astype(np.intp)
+        starts = np.flatnonzero(np.diff(group,prepend=-1))
+        w = np.add.reduceat(weights,starts)
+        self.means = np.add.reduceat(means*weights,starts)/w
+        self.weights = w
+
+    # Quantile(s) in [0, 1] interpolated between centroid midpoints
+    def quantile(self,q):
+        q = np.asarray(q,dtype=np.float64)
+        if self.weights.size == 0:
+            return np.full(q.shape,np.nan)[()]
+        total = self.weights.sum()
+        mid = np.cumsum(self.weights) - 0.5*self.weights
+        xp = np.concatenate(([0.0],mid,[total]))
+        fp = np.concatenate(([self.min],self.means,[self.max]))
+        return np.interp(q*total,xp,fp)[()]
+
+# Histogram and quantile sketch of one index
+class IndexSketch:
+
+    def __init__(self,index,bins=1024,compression=200,value_range=None):
+        self.index = getattr(index,'__name__',index)
+        if value_range is None:
+            self.histogram = FixedHistogram.for_index(self.index,bins)
+        else:
+            self.histogram = FixedHistogram(value_range[0],value_range[1],bins)
+        self.digest = TDigest(compression)
+
+    def update(self,values):
+        self.histogram.update(values)
+        self.digest.update(values)
+        return self
+
+    def merge(self,other):
+        if other.index != self.index:
+            raise ValueError("Cannot merge sketches of %r and %r" % (self.index,other.index))
+        self.histogram.merge(other.histogram)
+        self.digest.merge(other.digest)
+        return self
+
+    # Quantile(s) in [0, 1] from the t-digest or the fixed histogram
+    def quantile(self,q,method='digest'):
+        if method == 'digest':
+            return self.digest.quantile(q)
+        if method == 'histogram':
+            return self.histogram.quantile(q)
+        raise ValueError("method must be 'digest' or 'histogram'")
+
+    # Percentile-based display stretch, 2/98 by default
+    def stretch(self,low=2.0,high=98.0,method='digest'):
+        lo, hi = self.quantile([low/100.0,high/100.0],method)
+        return float(lo), float(hi)
+
+# Sketch an index in one streaming pass over band sources
+def sketch_index(index,bands,tile=512,bins=1024,compression=200,value_range=None,dtype=np.float64,**params):
+    func = resolve_index(index)
+    sketch = IndexSketch(func.__name__,bins,compression,value_range)
+    for _, _, values in iter_index_tiles(func,bands,tile,dtype,params):
+        sketch.update(values)
+    return sketch
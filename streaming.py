@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Tile-streaming utilities for out-of-core band rasters
+
+Band sources are any 2-D array-likes that expose ``shape`` and support
+slicing by a pair of slices (numpy.memmap, h5py/zarr datasets, ...), so a
+scene is only ever read one tile at a time.
+
+"""
+
+import inspect
+from collections import namedtuple
+
+import numpy as np
+
+from .vegetation_indices import Npvi, Xpvi
+
+# Yield (row slice, column slice) windows covering a 2-D raster
+def iter_windows(shape,tile=512):
+    if np.isscalar(tile):
+        tile = (tile,tile)
+    rows, cols = shape[0], shape[1]
+    for r0 in range(0,rows,tile[0]):
+        for c0 in range(0,cols,tile[1]):
+            yield (slice(r0,min(r0+tile[0],rows)),slice(c0,min(c0+tile[1],cols)))
+
+# Read one window of every band source as a floating point array
+def read_window(bands,window,dtype=np.float64):
+    return {name:np.asarray(src[window],dtype=dtype) for name,src in bands.items()}
+
+# Resolve an index given as an Npvi function or by name (e.g. 'ndvi')
+def resolve_index(index):
+    if callable(index):
+        return index
+    func = getattr(Npvi,str(index).lower(),None)
+    if func is None:
+        raise ValueError("Unknown vegetation index: %r" % (index,))
+    return func
+
+BAND_NAMES = ('blue','green','red','re','re1','re2','re3','nir')
+
+# Band parameter names of an Npvi index (e.g. ('red','nir'))
+def index_bands(func):
+    return tuple(p for p in inspect.signature(func).parameters if p in BAND_NAMES)
+
+# Pure (non-printing) Xpvi form of an Npvi index; other callables are kept
+def pure_index(func):
+    if getattr(Npvi,func.__name__,None) is func:
+        return getattr(Xpvi,func.__name__)
+    return func
+
+# Evaluate an index, printing its citation only when asked to; otherwise the
+# pure form is used, so it is safe to call from several threads at once
+def evaluate_index(func,bands,params=None,cite=False):
+    params = params or {}
+    if not cite:
+        func = pure_index(func)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return func(**bands,**params)
+
+# Print the citation of an index once, as a plain Npvi call would
+def cite_index(func,params=None):
+    evaluate_index(func,{b:np.ones((1,1)) for b in index_bands(func)},params,cite=True)
+
+# Sources of the bands an index takes (all of them for custom callables)
+def select_bands(func,bands):
+    names = index_bands(func)
+    if not names:
+        return dict(bands)
+    missing = [n for n in names if n not in bands]
+    if missing:
+        raise ValueError("%s needs bands %s" % (func.__name__,missing))
+    return {n:bands[n] for n in names}
+
+# Yield (window, tile bands, index values) for each tile of a scene; extra
+# bands in `bands` are ignored and the citation is printed with the first tile
+def iter_index_tiles(index,bands,tile=512,dtype=np.float64,params=None,cite=True):
+    func = resolve_index(index)
+    bands = select_bands(func,bands)
+    shape = next(iter(bands.values())).shape
+    for window in iter_windows(shape,tile):
+        tile_bands = read_window(bands,window,dtype)
+        yield window, tile_bands, evaluate_index(func,tile_bands,params,cite)
+        cite = False
+
+# Compute an index tile by tile into `out` (allocated in memory if None);
+# pass a qa.IndexQA as `qa` to range-check the tiles as they are computed
+def stream_index(index,bands,out=None,tile=512,dtype=np.float64,qa=None,**params):
+    func = resolve_index(index)
+    if out is None:
+        out = np.empty(next(iter(select_bands(func,bands).values())).shape,dtype=dtype)
+    for window, tile_bands, values in iter_index_tiles(func,bands,tile,dtype,params):
+        if qa is not None:
+            qa.update(values,tile_bands,params)
+        out[window] = values
+    return out
+
+# Fitted soil line (nir = slope*red + intercept)
+class SoilLineFit(namedtuple('SoilLineFit',['slope','intercept','n','r'])):
+    __slots__ = ()
+
+    # Keyword arguments for the Npvi/Geevi soil-line indices
+    def params(self,index):
+        name = getattr(index,'__name__',index)
+        if name == 'tsavi':
+            return {'s':self.slope,'a':self.intercept}
+        if name == 'wdvi':
+            return {'a':self.slope}
+        if name == 'msavi':
+            return {'s':self.slope,'a':self.slope}
+        raise ValueError("Index %r does not take soil-line parameters" % (name,))
+
+# Single-pass soil-line estimator over red/NIR bare-soil pixels
+#
+# Exact least squares is accumulated with mergeable co-moments (Chan et al.),
+# so tiles may arrive in any order or from several workers. With `trim` set,
+# a fixed-range 2-D red/NIR histogram is accumulated as well and the line is
+# refitted on the histogram, discarding bins further than `trim` standard
+# deviations from the line until the selection is stable. Pixels outside
+# `red_range`/`nir_range` cannot be binned; they are counted in `outside`,
+# and the fit fails when they are the majority (e.g. DN-scaled 0-10000 bands
+# with the default reflectance range), asking for ranges that fit the data.
+class SoilLine:
+
+    def __init__(self,ndvi_max=0.2,trim=None,bins=256,red_range=(0.0,1.0),nir_range=(0.0,1.0),iterations=10):
+        self.ndvi_max = ndvi_max
+        self.trim = trim
+        self.bins = bins
+        self.red_range = tuple(red_range)
+        self.nir_range = tuple(nir_range)
+        self.iterations = iterations
+        self.n = 0
+        self.mean_red = 0.0
+        self.mean_nir = 0.0
+        self.m2_red = 0.0
+        self.m2_nir = 0.0
+        self.c_rn = 0.0
+        self.hist = np.zeros((bins,bins),dtype=np.int64) if trim is not None else None
+        self.outside = 0
+
+    # Add one tile of red/NIR reflectance; `mask` marks bare-soil pixels
+    # (when omitted, pixels with NDVI <= ndvi_max are used)
+    def update(self,red,nir,mask=None):
+        red = np.asarray(red,dtype=np.float64).ravel()
+        nir = np.asarray(nir,dtype=np.float64).ravel()
+        valid = np.isfinite(red) & np.isfinite(nir)
+        if mask is not None:
+            valid &= np.asarray(mask,dtype=bool).ravel()
+        elif self.ndvi_max is not None:
+            total = nir + red
+            valid &= (total > 0) & ((nir-red) <= self.ndvi_max*total)
+        x = red[valid]
+        y = nir[valid]
+        n = x.size
+        if n == 0:
+            return self
+        mx = x.mean()
+        my = y.mean()
+        dx = x - mx
+        dy = y - my
+        self._combine(n,mx,my,np.dot(dx,dx),np.dot(dy,dy),np.dot(dx,dy))
+        if self.hist is not None:
+            h, _, _ = np.histogram2d(x,y,bins=self.bins,range=(self.red_range,self.nir_range))
+            self.hist += h.astype(np.int64)
+            self.outside += n - int(h.sum())
+        return self
+
+    # Merge the state of another estimator (e.g. from a worker process)
+    def merge(self,other):
+        if other.n:
+            self._combine(other.n,other.mean_red,other.mean_nir,other.m2_red,other.m2_nir,other.c_rn)
+        if self.hist is not None and other.hist is not None:
+            self.hist += other.hist
+            self.outside += other.outside
+        return self
+
+    def _combine(self,n,mx,my,m2x,m2y,cxy):
+        total = self.n + n
+        dx = mx - self.mean_red
+        dy = my - self.mean_nir
+        f = self.n*n/total
+        self.m2_red += m2x + dx*dx*f
+        self.m2_nir += m2y + dy*dy*f
+        self.c_rn += cxy + dx*dy*f
+        self.mean_red += dx*n/total
+        self.mean_nir += dy*n/total
+        self.n = total
+
+    # Fit the soil line from the accumulated state
+    def fit(self):
+        if self.n < 2 or self.m2_red <= 0:
+            raise ValueError("Not enough bare-soil pixels to fit a soil line")
+        if self.hist is not None:
+            return self._fit_histogram()
+        slope = self.c_rn/self.m2_red
+        intercept = self.mean_nir - slope*self.mean_red
+        r = self.c_rn/np.sqrt(self.m2_red*self.m2_nir) if self.m2_nir > 0 else 0.0
+        return SoilLineFit(float(slope),float(intercept),int(self.n),float(r))
+
+    def _fit_histogram(self):
+        if 2*self.outside > self.n:
+            raise ValueError("%d of %d bare-soil pixels fall outside red_range=%s / nir_range=%s; "
+                             "set red_range and nir_range to the value range of the bands "
+                             "(e.g. (0, 10000) for DN-scaled reflectance)"
+                             % (self.outside,self.n,self.red_range,self.nir_range))
+        rx = np.linspace(self.red_range[0],self.red_range[1],self.bins+1)
+        ry = np.linspace(self.nir_range[0],self.nir_range[1],self.bins+1)
+        cx, cy = np.meshgrid(0.5*(rx[:-1]+rx[1:]),0.5*(ry[:-1]+ry[1:]),indexing='ij')
+        w = self.hist.astype(np.float64)
+        keep = w > 0
+        for _ in range(self.iterations):
+            sw = w[keep].sum()
+            mx = (w[keep]*cx[keep]).sum()/sw
+            my = (w[keep]*cy[keep]).sum()/sw
+            sxx = (w[keep]*(cx[keep]-mx)**2).sum()
+            syy = (w[keep]*(cy[keep]-my)**2).sum()
+            sxy = (w[keep]*(cx[keep]-mx)*(cy[keep]-my)).sum()
+            if sxx <= 0:
+                raise ValueError("Not enough bare-soil pixels to fit a soil line")
+            slope = sxy/sxx
+            intercept = my - slope*mx
+            resid = cy - (slope*cx + intercept)
+            sigma = np.sqrt((w[keep]*resid[keep]**2).sum()/sw)
+            new_keep = (w > 0) & (np.abs(resid) <= self.trim*sigma)
+            if sigma == 0 or np.array_equal(new_keep,keep) or not new_keep.any():
+                break
+            keep = new_keep
+        r = sxy/np.sqrt(sxx*syy) if syy > 0 else 0.0
+        return SoilLineFit(float(slope),float(intercept),int(sw),float(r))
+
+# Estimate the soil line in one streaming pass over red/NIR sources
+def estimate_soil_line(red,nir,mask=None,tile=512,**kwargs):
+    estimator = SoilLine(**kwargs)
+    for window in iter_windows(red.shape,tile):
+        estimator.update(red[window],nir[window],None if mask is None else mask[window])
+    return estimator.fit()
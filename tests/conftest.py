@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# The repository root is the pyvi package itself; import it as ``pyvi`` so
+# the modules' relative imports resolve, with the recording ee stub standing
+# in for Earth Engine when it is not installed
+
+import os
+import sys
+import types
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0,TESTS)
+
+from ee_stub import RecordingEE
+
+try:
+    import ee  # noqa: F401
+except ImportError:
+    sys.modules['ee'] = RecordingEE()
+
+if 'pyvi' not in sys.modules:
+    pyvi = types.ModuleType('pyvi')
+    pyvi.__path__ = [os.path.dirname(TESTS)]
+    sys.modules['pyvi'] = pyvi
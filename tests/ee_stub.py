@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Recording stand-in for the Earth Engine ``ee`` module
+
+Every constructor and method call builds a Node that remembers its name,
+parent (the object the method was called on), arguments and keyword
+arguments, so tests can inspect the computation graph a function builds.
+``getInfo`` is recorded as well and evaluated against a table of `rows`
+features whose properties are {'row': i}.
+
+"""
+
+# One call in the computation graph
+class Node:
+
+    def __init__(self,ee,name,parent=None,args=(),kwargs=None):
+        self.ee = ee
+        self.name = name
+        self.parent = parent
+        self.args = args
+        self.kwargs = kwargs or {}
+        ee.nodes.append(self)
+
+    def __getattr__(self,name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        def method(*args,**kwargs):
+            return Node(self.ee,name,self,args,kwargs)
+        return method
+
+    # Calls the mapped function once on a placeholder element
+    def map(self,func):
+        return Node(self.ee,'map',self,(func(Node(self.ee,'element',self)),))
+
+    def getInfo(self):
+        self.ee.info_calls.append(self)
+        return self.ee.evaluate(self)
+
+    def __repr__(self):
+        return 'Node(%s)' % self.name
+
+# Module-level constructor (ee.Image, ee.FeatureCollection, ...); its
+# attributes are static methods such as ee.Image.cat
+class Constructor:
+
+    def __init__(self,ee,name):
+        self.ee = ee
+        self.name = name
+
+    def __call__(self,*args,**kwargs):
+        return Node(self.ee,self.name,None,args,kwargs)
+
+    def __getattr__(self,name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        def method(*args,**kwargs):
+            return Node(self.ee,'%s.%s' % (self.name,name),None,args,kwargs)
+        return method
+
+class RecordingEE:
+
+    def __init__(self,rows=0):
+        self.rows = rows
+        self.nodes = []
+        self.info_calls = []
+        for name in ('Image','ImageCollection','Feature','FeatureCollection','Reducer','Dictionary'):
+            setattr(self,name,Constructor(self,name))
+
+    # Recorded nodes with the given name
+    def find(self,name):
+        return [n for n in self.nodes if n.name == name]
+
+    # Client-side value of the nodes zonal_timeseries fetches
+    def evaluate(self,node):
+        if node.name == 'Dictionary':
+            return {k:self.evaluate(v) for k,v in node.args[0].items()}
+        if node.name == 'size':
+            return self.rows
+        if node.name == 'FeatureCollection' and getattr(node.args[0],'name',None) == 'toList':
+            count, offset = node.args[0].args
+            return {'type':'FeatureCollection',
+                    'features':[{'type':'Feature','properties':{'row':i}}
+                                for i in range(offset,min(offset+count,self.rows))]}
+        raise NotImplementedError("getInfo of %r" % (node,))
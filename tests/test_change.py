@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from pyvi.change import change_mask, detect_change
+
+def dates(shape=(90,70)):
+    rng = np.random.default_rng(0)
+    red = rng.uniform(0.03,0.08,shape)
+    nir0 = rng.uniform(0.2,0.25,shape)
+    nir1 = nir0.copy()
+    nir1[:30] = 0.1
+    nir1[60:] = 0.9
+    before = {'red':red,'nir':nir0,'swir':np.zeros(shape)}
+    after = {'red':red,'nir':nir1}
+    return before, after
+
+def ndvi(bands):
+    return (bands['nir']-bands['red'])/(bands['nir']+bands['red'])
+
+def test_change_values():
+    before, after = dates()
+    diff = detect_change('ndvi',before,after,tile=32).change
+    np.testing.assert_allclose(diff,ndvi(after)-ndvi(before))
+    delta = detect_change('ndvi',before,after,mode='delta',tile=32).change
+    np.testing.assert_allclose(delta,ndvi(before)-ndvi(after))
+
+@pytest.mark.parametrize('mode',['difference','delta','relative'])
+def test_direction_is_independent_of_mode(mode):
+    before, after = dates()
+    loss = np.zeros((90,70),dtype=bool)
+    loss[:30] = True
+    gain = np.zeros((90,70),dtype=bool)
+    gain[60:] = True
+    for direction, expected in [('decrease',loss),('increase',gain),('both',loss|gain)]:
+        result = detect_change('ndvi',before,after,mode=mode,threshold=0.1,direction=direction,tile=32)
+        np.testing.assert_array_equal(result.mask,expected)
+        assert result.changed == expected.sum()
+
+def test_change_mask_delta_sign():
+    change = np.array([-0.5,0.0,0.5])
+    np.testing.assert_array_equal(change_mask(change,0.2,'decrease','delta'),[False,False,True])
+    np.testing.assert_array_equal(change_mask(change,0.2,'increase','delta'),[True,False,False])
+    np.testing.assert_array_equal(change_mask(change,0.2,'decrease'),[True,False,False])
+    with pytest.raises(ValueError):
+        change_mask(change,0.2,'sideways')
+
+def test_rejects_bad_inputs():
+    before, after = dates()
+    with pytest.raises(ValueError,match='mode'):
+        detect_change('ndvi',before,after,mode='ratio')
+    with pytest.raises(ValueError,match='shape'):
+        detect_change('ndvi',before,{'red':before['red'][:10],'nir':before['nir'][:10]})
+    with pytest.raises(ValueError,match='needs bands'):
+        detect_change('ndvi',before,{'red':before['red']})
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from pyvi.cog import COGWriter, geotransform, write_cog
+
+tifffile = pytest.importorskip('tifffile')
+pytest.importorskip('imagecodecs')
+
+GEOTRANSFORM = (500000.0,10.0,0.0,9000000.0,0.0,-10.0)
+
+def scene(shape=(100,70)):
+    rng = np.random.default_rng(0)
+    red = rng.uniform(0.01,0.3,shape)
+    nir = rng.uniform(0.2,0.6,shape)
+    red[:7,:5] = 0.0
+    nir[:7,:5] = 0.0
+    return {'red':red,'nir':nir}
+
+def ndvi(bands):
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return ((bands['nir']-bands['red'])/(bands['nir']+bands['red'])).astype(np.float32)
+
+# 2x2 NaN-aware means of a raster padded to even size with NaN
+def overview(data):
+    h, w = data.shape
+    padded = np.full((h+h%2,w+w%2),np.nan)
+    padded[:h,:w] = data
+    q = padded.reshape(padded.shape[0]//2,2,padded.shape[1]//2,2)
+    finite = np.isfinite(q)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.where(finite,q,0.0).sum(axis=(1,3))/finite.sum(axis=(1,3))
+
+def read_levels(path):
+    with tifffile.TiffFile(path) as tif:
+        pages = list(tif.pages)
+        return [p.asarray() for p in pages], {t.name:t.value for t in pages[0].tags.values()}
+
+@pytest.mark.parametrize('bigtiff',[False,True])
+def test_float_cog(tmp_path,bigtiff):
+    path = str(tmp_path/'ndvi.tif')
+    bands = scene()
+    writer = COGWriter(path,70,100,block=16,transform=GEOTRANSFORM,epsg=32750,bigtiff=bigtiff)
+    with writer:
+        for r in range(0,100,32):
+            for c in range(0,70,32):
+                writer.write((slice(r,min(r+32,100)),slice(c,min(c+32,70))),ndvi(bands)[r:r+32,c:c+32])
+    levels, tags = read_levels(path)
+    assert [l.shape for l in levels] == [(100,70),(50,35),(25,18),(13,9)]
+    expected = ndvi(bands)
+    np.testing.assert_array_equal(levels[0],expected)
+    for level in levels[1:]:
+        expected = overview(expected)
+        np.testing.assert_allclose(level,expected,rtol=1e-6,equal_nan=True)
+    assert np.isnan(levels[0][:7,:5]).all()
+    assert tags['GDAL_NODATA'] == 'nan'
+    assert tags['ModelPixelScaleTag'] == (10.0,10.0,0.0)
+    assert tags['ModelTiepointTag'] == (0.0,0.0,0.0,500000.0,9000000.0,0.0)
+    geokeys = tags['GeoKeyDirectoryTag']
+    assert tuple(geokeys[:4]) == (1,1,0,3)
+    assert tuple(geokeys[-4:]) == (3072,0,1,32750)
+
+def test_scaled_cog(tmp_path):
+    path = str(tmp_path/'ndvi_int16.tif')
+    bands = scene()
+    write_cog('ndvi',bands,path,block=16,scale=0.0001,transform=GEOTRANSFORM,epsg=4326)
+    levels, tags = read_levels(path)
+    assert levels[0].dtype == np.int16
+    assert [l.shape for l in levels] == [(100,70),(50,35),(25,18),(13,9)]
+    expected = ndvi(bands)
+    nodata = levels[0] == -32768
+    np.testing.assert_array_equal(nodata,~np.isfinite(expected))
+    assert np.abs(levels[0][~nodata]-np.round(expected[~nodata]/0.0001)).max() <= 1
+    decoded = np.where(levels[1] == -32768,np.nan,levels[1]*0.0001)
+    np.testing.assert_allclose(decoded,overview(expected),atol=1e-4,equal_nan=True)
+    assert tags['GDAL_NODATA'] == '-32768'
+    assert 'role="scale">0.0001<' in tags['GDAL_METADATA']
+    geokeys = tags['GeoKeyDirectoryTag']
+    assert tuple(geokeys[4:8]) == (1024,0,1,2)
+    assert tuple(geokeys[-4:]) == (2048,0,1,4326)
+
+def test_transform_is_validated_up_front(tmp_path):
+    affine = (10.0,0.0,500000.0,0.0,-10.0,9000000.0,0.0,0.0,1.0)
+    assert geotransform(affine) == GEOTRANSFORM
+    with pytest.raises(ValueError,match='north-up'):
+        COGWriter(str(tmp_path/'a.tif'),10,10,transform=(0.0,10.0,1.0,0.0,0.0,-10.0))
+    with pytest.raises(ValueError,match='geotransform'):
+        COGWriter(str(tmp_path/'a.tif'),10,10,transform=(0.0,10.0,0.0,-10.0))
+    with pytest.raises(ValueError,match='epsg'):
+        COGWriter(str(tmp_path/'a.tif'),10,10,epsg='UTM 50S')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import warnings
+
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from pyvi import filters
+
+MODES = ['reflect','nearest','mirror','constant']
+
+def raster(shape=(130,110),seed=0):
+    return np.random.default_rng(seed).normal(0.4,0.2,shape)
+
+def with_nan(a,seed=1):
+    a = a.copy()
+    rng = np.random.default_rng(seed)
+    a[rng.random(a.shape) < 0.1] = np.nan
+    a[20:30,40:55] = np.nan
+    a[5,5] = np.inf
+    return a
+
+@pytest.mark.parametrize('mode',MODES)
+def test_finite_data_matches_ndimage(mode):
+    a = raster()
+    np.testing.assert_array_equal(filters.median(a,(3,5),tile=32,workers=3,mode=mode),
+                                  ndimage.median_filter(a,(3,5),mode=mode))
+    np.testing.assert_allclose(filters.mean(a,5,tile=32,workers=3,mode=mode),
+                               ndimage.uniform_filter(a,5,mode=mode),rtol=0,atol=1e-12)
+    m = ndimage.uniform_filter(a,5,mode=mode)
+    std = np.sqrt(np.maximum(ndimage.uniform_filter(a*a,5,mode=mode)-m*m,0))
+    np.testing.assert_allclose(filters.local_std(a,5,tile=32,mode=mode),std,rtol=0,atol=1e-12)
+
+@pytest.mark.parametrize('func',[filters.median,filters.mean,filters.local_std])
+@pytest.mark.parametrize('mode',MODES)
+def test_tiled_equals_whole_with_nan(func,mode):
+    a = with_nan(raster())
+    whole = func(a,5,tile=1000,mode=mode)
+    tiled = func(a,5,tile=32,workers=4,mode=mode)
+    np.testing.assert_array_equal(np.isnan(tiled),np.isnan(whole))
+    np.testing.assert_allclose(tiled,whole,rtol=0,atol=1e-12,equal_nan=True)
+    assert np.isnan(tiled[~np.isfinite(a)]).all()
+    assert np.isnan(tiled[22:28,42:53]).all()
+
+def test_nan_are_ignored():
+    a = with_nan(raster((40,40)))
+    finite = np.where(np.isfinite(a),a,np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(np.pad(finite,1,mode='symmetric'),(3,3))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore',RuntimeWarning)
+        mean = np.nanmean(windows,axis=(2,3))
+        std = np.nanstd(windows,axis=(2,3))
+    ordered = np.sort(windows.reshape(40,40,9),axis=-1)
+    count = np.isfinite(ordered).sum(axis=-1)
+    median = np.take_along_axis(ordered,np.minimum(count//2,8)[...,None],axis=-1)[...,0]
+    for result, expected in [(filters.mean(a,3,tile=16),mean),(filters.local_std(a,3,tile=16),std),
+                             (filters.median(a,3,tile=16),median)]:
+        expected = np.where(np.isfinite(a) & (count > 0),expected,np.nan)
+        np.testing.assert_allclose(result,expected,rtol=0,atol=1e-12,equal_nan=True)
+
+def test_no_finite_neighbor_is_nan():
+    a = np.full((20,20),np.nan)
+    a[0,0] = 1.0
+    for func in (filters.median,filters.mean,filters.local_std):
+        result = func(a,3,tile=8)
+        assert np.isfinite(result).sum() == 1
+
+@pytest.mark.parametrize('func',['opening','closing','erosion','dilation'])
+def test_morphology_matches_ndimage(func):
+    mask = np.random.default_rng(2).random((120,90)) < 0.4
+    expected = getattr(ndimage,'binary_'+func)(mask,iterations=2)
+    np.testing.assert_array_equal(getattr(filters,func)(mask,iterations=2,tile=25,workers=3),expected)
+
+def test_wrap_is_rejected():
+    with pytest.raises(ValueError,match='mode'):
+        filters.mean(raster((10,10)),mode='wrap')
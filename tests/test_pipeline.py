@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from pyvi.pipeline import run_pipeline
+
+# Custom index at module level, so it pickles for the process executor
+def red_nir_ratio(red,nir,k=1.0):
+    return k*red/nir
+
+def scenes():
+    rng = np.random.default_rng(0)
+    return {name:{'red':rng.uniform(0.01,0.3,(70,50)),'nir':rng.uniform(0.2,0.6,(70,50)),
+                  'blue':rng.uniform(0.01,0.1,(70,50))} for name in ('a','b')}
+
+@pytest.mark.parametrize('executor',['thread','process'])
+def test_npvi_and_custom_indices(executor):
+    data = scenes()
+    result = run_pipeline(data,['ndvi',red_nir_ratio],params={'red_nir_ratio':{'k':2.0}},
+                          tile=32,workers=2,executor=executor,dtype=np.float64)
+    for scene, bands in data.items():
+        ndvi = (bands['nir']-bands['red'])/(bands['nir']+bands['red'])
+        np.testing.assert_allclose(result.outputs[(scene,'ndvi')].data,ndvi)
+        np.testing.assert_allclose(result.outputs[(scene,'red_nir_ratio')].data,2.0*bands['red']/bands['nir'])
+    assert result.stats['compute'].items == 2*6
+
+def test_qa_counts():
+    data = scenes()
+    data['a']['red'][0,:4] = 0.0
+    data['a']['nir'][0,:4] = 0.0
+    result = run_pipeline(data,['ndvi'],tile=32,workers=2,qa=True)
+    assert result.qa[('a','ndvi')].nan == 4
+    assert result.qa[('b','ndvi')].nan == 0
+
+def test_rejects_bad_indices():
+    with pytest.raises(ValueError,match='Unknown vegetation index'):
+        run_pipeline(scenes(),['nope'])
+    with pytest.raises(ValueError,match='takes none of the bands'):
+        run_pipeline(scenes(),[lambda x: x])
+    with pytest.raises(ValueError,match='unique'):
+        run_pipeline(scenes(),['ndvi','NDVI'])
+    with pytest.raises(ValueError,match='lacks bands'):
+        run_pipeline({'a':{'red':np.ones((4,4))}},['ndvi'])
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+import numpy as np
+import pytest
+
+from pyvi.sketches import FixedHistogram, TDigest, IndexSketch, sketch_index
+
+QS = [0.0,0.02,0.1,0.5,0.9,0.98,1.0]
+
+def sample(n=200000,seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.concatenate((rng.beta(5,2,n//2)*1.6-0.8,rng.normal(0.1,0.05,n-n//2)))
+    rng.shuffle(values)
+    return values
+
+# Fraction of values below each estimate minus the requested rank
+def rank_error(values,estimates,qs):
+    ordered = np.sort(values)
+    return np.abs(np.searchsorted(ordered,estimates)/ordered.size-np.asarray(qs)).max()
+
+def test_histogram_merge_is_exact():
+    values = sample()
+    values[:50] = np.nan
+    values[50:60] = 5.0
+    whole = FixedHistogram(-1,1,256).update(values)
+    parts = [FixedHistogram(-1,1,256).update(p) for p in np.array_split(values,7)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(pickle.loads(pickle.dumps(part)))
+    np.testing.assert_array_equal(merged.counts,whole.counts)
+    assert (merged.underflow,merged.overflow,merged.nonfinite) == (whole.underflow,whole.overflow,50)
+    assert merged.overflow == 10
+    finite = values[np.isfinite(values)]
+    estimates = merged.quantile([0.02,0.5,0.9])
+    assert np.abs(estimates-np.quantile(finite,[0.02,0.5,0.9])).max() <= 2.0/256
+
+def test_histogram_rejects_other_binning():
+    with pytest.raises(ValueError):
+        FixedHistogram(-1,1,256).merge(FixedHistogram(0,1,256))
+
+def test_digest_merge_accuracy():
+    values = sample()
+    parts = [TDigest(200).update(tile) for tile in np.array_split(values,40)]
+    merged = TDigest(200)
+    for part in parts:
+        merged.merge(pickle.loads(pickle.dumps(part)))
+    assert merged.count == values.size
+    assert merged.weights.size < 400
+    estimates = merged.quantile(QS)
+    assert estimates[0] == values.min() and estimates[-1] == values.max()
+    assert rank_error(values,estimates,QS) < 0.002
+    single = TDigest(200).update(values)
+    assert rank_error(values,single.quantile(QS),QS) < 0.002
+
+def test_empty_sketches():
+    assert np.isnan(TDigest().quantile(0.5))
+    assert np.isnan(FixedHistogram(0,1).quantile(0.5))
+    assert TDigest().merge(TDigest()).count == 0
+
+def test_sketch_index_ignores_extra_bands():
+    rng = np.random.default_rng(1)
+    bands = {'red':rng.uniform(0.01,0.3,(200,150)),'nir':rng.uniform(0.2,0.6,(200,150)),
+             'blue':np.zeros((200,150))}
+    bands['red'][0,:10] = bands['nir'][0,:10] = 0.0
+    sketch = sketch_index('ndvi',bands,tile=64)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        ndvi = (bands['nir']-bands['red'])/(bands['nir']+bands['red'])
+    assert sketch.histogram.nonfinite == 10
+    assert sketch.digest.count == ndvi.size-10
+    lo, hi = sketch.stretch()
+    assert rank_error(ndvi[np.isfinite(ndvi)],[lo,hi],[0.02,0.98]) < 0.002
+    halves = IndexSketch('ndvi').update(ndvi[:100]).merge(IndexSketch('ndvi').update(ndvi[100:]))
+    np.testing.assert_array_equal(halves.histogram.counts,sketch.histogram.counts)
+    with pytest.raises(ValueError):
+        halves.merge(IndexSketch('evi'))
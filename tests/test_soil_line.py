@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import warnings
+
+import numpy as np
+import pytest
+
+from pyvi.streaming import SoilLine, estimate_soil_line
+
+def soil(shape=(300,300)):
+    rng = np.random.default_rng(0)
+    red = rng.uniform(0.05,0.4,shape)
+    nir = 1.1*red+0.03+rng.normal(0,0.005,shape)
+    return red, nir
+
+def test_trimmed_fit():
+    red, nir = soil()
+    fit = estimate_soil_line(red,nir,tile=64,trim=2.5)
+    assert fit.slope == pytest.approx(1.1,abs=0.01)
+    assert fit.intercept == pytest.approx(0.03,abs=0.005)
+
+def test_merge_matches_single_pass():
+    red, nir = soil()
+    whole = SoilLine(trim=2.5).update(red,nir)
+    merged = SoilLine(trim=2.5).update(red[:100],nir[:100]).merge(SoilLine(trim=2.5).update(red[100:],nir[100:]))
+    assert merged.fit() == pytest.approx(whole.fit())
+    assert SoilLine().update(red,nir).fit() == pytest.approx(estimate_soil_line(red,nir,tile=50))
+
+def test_out_of_range_pixels_need_ranges():
+    red, nir = soil()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with pytest.raises(ValueError,match='red_range'):
+            estimate_soil_line(red*10000,nir*10000,trim=2.5)
+        fit = estimate_soil_line(red*10000,nir*10000,trim=2.5,red_range=(0,10000),nir_range=(0,10000))
+    assert fit.slope == pytest.approx(1.1,abs=0.01)
+    assert fit.intercept == pytest.approx(300,abs=50)
+
+def test_few_out_of_range_pixels_are_counted():
+    red, nir = soil()
+    red[0,:10] = 1.5
+    nir[0,:10] = 1.6
+    estimator = SoilLine(ndvi_max=None,trim=2.5).update(red,nir)
+    assert estimator.outside == 10
+    assert estimator.fit().slope == pytest.approx(1.1,abs=0.01)
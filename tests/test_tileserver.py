@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from pyvi.tileserver import TileRenderer, make_server, scene_fingerprint
+
+def scene(seed,shape=(300,300)):
+    rng = np.random.default_rng(seed)
+    return {'red':rng.uniform(0.01,0.3,shape),'nir':rng.uniform(0.2,0.6,shape)}
+
+def test_disk_cache_is_per_scene(tmp_path):
+    a = TileRenderer(scene(0),cache_dir=str(tmp_path))
+    b = TileRenderer(scene(1),cache_dir=str(tmp_path))
+    assert a.scene != b.scene
+    assert a.render('ndvi',1,0,0) != b.render('ndvi',1,0,0)
+    # A new renderer of the first scene reads its tiles back from disk
+    again = TileRenderer(scene(0),cache_dir=str(tmp_path))
+    assert again.render('ndvi',1,0,0) == a.render('ndvi',1,0,0)
+    assert again.cache.hits == 1 and again.cache.misses == 0
+
+def test_scene_fingerprint_of_memmaps(tmp_path):
+    bands = {}
+    for name, values in scene(0).items():
+        bands[name] = np.memmap(str(tmp_path/(name+'.dat')),dtype=np.float64,mode='w+',shape=values.shape)
+        bands[name][:] = values
+        bands[name].flush()
+    assert scene_fingerprint(bands) == scene_fingerprint(dict(bands))
+    assert scene_fingerprint(bands) != scene_fingerprint({'red':bands['red'],'nir':bands['red']})
+
+def test_explicit_scene_name(tmp_path):
+    renderer = TileRenderer(scene(0),cache_dir=str(tmp_path),scene='S2_20240105')
+    renderer.render('ndvi',0,0,0)
+    assert (tmp_path/'S2_20240105'/'ndvi').is_dir()
+
+@pytest.fixture
+def server():
+    server = make_server(scene(0),port=0)
+    thread = threading.Thread(target=server.serve_forever,daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url,timeout=10) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+@pytest.mark.parametrize('query',['vmin=0&vmax=0','vmin=1&vmax=0','vmin=nan','vmax=inf','vmax=-1'])
+def test_bad_stretch_is_rejected(server,query):
+    status, body = get(server+'/ndvi/0/0/0.png?'+query)
+    assert status == 400
+    assert 'vmin' in json.loads(body)['error']
+
+def test_tile(server):
+    status, body = get(server+'/ndvi/0/0/0.png?vmin=0&vmax=0.8')
+    assert status == 200 and body.startswith(b'\x89PNG')
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from pyvi.vegetation_indices import Xpvi
+
+def bands():
+    rng = np.random.default_rng(0)
+    return {'blue':rng.uniform(0.01,0.1,(8,8)),'red':rng.uniform(0.01,0.3,(8,8)),
+            'nir':rng.uniform(0.2,0.6,(8,8))}
+
+def test_multi_matches_single_indices():
+    b = bands()
+    result = Xpvi.multi(['NDVI','Savi','evi'],params={'SAVI':{'l':0.25}})(**b)
+    assert sorted(result) == ['evi','ndvi','savi']
+    np.testing.assert_allclose(result['ndvi'],Xpvi.ndvi(b['red'],b['nir']))
+    np.testing.assert_allclose(result['savi'],Xpvi.savi(b['red'],b['nir'],l=0.25))
+    np.testing.assert_allclose(result['evi'],Xpvi.evi(b['blue'],b['red'],b['nir']))
+
+@pytest.mark.parametrize('name',['multi','MULTI','Multi','nope'])
+def test_multi_rejects_unknown_names(name):
+    with pytest.raises(ValueError,match='Unknown vegetation index'):
+        Xpvi.multi(['ndvi',name])
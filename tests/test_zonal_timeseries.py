@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+import pytest
+
+from ee_stub import RecordingEE
+from pyvi import vegetation_indices
+from pyvi.vegetation_indices import Geevi
+
+BAND_MAP = {'red':'B4','nir':'B8'}
+
+@pytest.fixture
+def stub(monkeypatch):
+    def make(rows):
+        ee = RecordingEE(rows)
+        monkeypatch.setattr(vegetation_indices,'ee',ee)
+        return ee
+    return make
+
+def run(ee,page_size,indices=('ndvi','savi'),**kwargs):
+    return Geevi.zonal_timeseries('COPERNICUS/S2_SR',ee.FeatureCollection('regions'),BAND_MAP,
+                                  list(indices),page_size=page_size,**kwargs)
+
+def test_builds_one_combined_graph(stub):
+    ee = stub(12)
+    run(ee,5,params={'savi':{'l':0.25}})
+    maps = [n for n in ee.find('map') if n.parent.name == 'ImageCollection']
+    assert len(maps) == 1
+    stacks = ee.find('Image.cat')
+    assert len(stacks) == 1
+    assert len(stacks[0].args[0]) == 2
+    assert len(ee.find('reduceRegions')) == 1
+    tables = set(id(n.parent) for n in ee.find('toList'))
+    assert len(tables) == 1
+    assert ee.find('toList')[0].parent.name == 'flatten'
+    assert any(n.args == (0.25,) for n in ee.find('add'))
+
+@pytest.mark.parametrize('rows,page_size',[(12,5),(10,5),(3,5),(5000,5000),(7,1)])
+def test_pages_with_ceil_getinfo_calls(stub,rows,page_size):
+    ee = stub(rows)
+    result = run(ee,page_size)
+    pages = math.ceil(rows/page_size)
+    assert len(ee.info_calls) == pages
+    assert [n.args for n in ee.find('toList')] == [(page_size,o) for o in range(0,pages*page_size,page_size)]
+    assert result == [{'row':i} for i in range(rows)]
+
+def test_unknown_index(stub):
+    ee = stub(1)
+    with pytest.raises(ValueError,match='Unknown vegetation index'):
+        run(ee,5,indices=('ndvi','nope'))
+    for name in ('zonal_timeseries','Zonal_Timeseries'):
+        with pytest.raises(ValueError,match='Unknown vegetation index'):
+            run(ee,5,indices=(name,))
+    assert not ee.info_calls
+
+def test_missing_band(stub):
+    ee = stub(1)
+    with pytest.raises(ValueError,match='band_map lacks'):
+        run(ee,5,indices=('ndvi','evi'))
+    assert not ee.info_calls
+
+def test_index_names_are_case_insensitive(stub):
+    ee = stub(3)
+    run(ee,5,indices=('NDVI','Savi'),params={'SAVI':{'l':0.25}})
+    assert any(n.args == (0.25,) for n in ee.find('add'))
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Python Vegetation Indices (PyVI)
+Local on-demand index tile server
+
+Serves any Npvi index as 256x256 PNG tiles over an XYZ pyramid of the
+scene's pixel grid (zoom level ``max_zoom`` is native resolution, each
+lower level halves it), computing each tile on demand from memory-mapped or
+windowed band sources. Tiles are colormapped through a precomputed uint8
+lookup table and kept in an in-memory LRU, optionally backed by a disk
+cache shared by several scenes (tiles are filed under a scene name or a
+fingerprint of the band sources). Only the Python standard library and NumPy are used, so it runs
+fully offline.
+
+    GET /                          JSON description of the scene and indices
+    GET /{index}/{z}/{x}/{y}.png   rendered tile, e.g. /ndvi/3/2/5.png
+                                   query: cmap, vmin, vmax, index parameters
+
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from .vegetation_indices import Npvi
+from .streaming import iter_windows, resolve_index, evaluate_index, cite_index, index_bands
+from .sketches import INDEX_RANGES
+
+# Anchor colors of the built-in colormaps
+COLORMAPS = {
+    'gray':[(0,0,0),(255,255,255)],
+    'rdylgn':[(165,0,38),(244,109,67),(254,224,139),(217,239,139),(102,189,99),(0,104,55)],
+    'viridis':[(68,1,84),(59,82,139),(33,145,140),(94,201,98),(253,231,37)],
+    'brbg':[(84,48,5),(191,129,45),(246,232,195),(128,205,193),(1,102,94)],
+}
+
+# Precomputed 256-entry RGBA lookup table of a colormap
+def colormap_lut(name='rdylgn'):
+    if name not in COLORMAPS:
+        raise ValueError("Unknown colormap: %r" % (name,))
+    anchors = np.asarray(COLORMAPS[name],dtype=np.float64)
+    pos = np.linspace(0.0,1.0,len(anchors))
+    x = np.linspace(0.0,1.0,256)
+    lut = np.empty((256,4),dtype=np.uint8)
+    for c in range(3):
+        lut[:,c] = np.round(np.interp(x,pos,anchors[:,c]))
+    lut[:,3] = 255
+    return lut
+
+# Reject color stretches that cannot be rendered
+def check_stretch(vmin,vmax):
+    if not (math.isfinite(vmin) and math.isfinite(vmax)):
+        raise ValueError("vmin and vmax must be finite")
+    if not vmin < vmax:
+        raise ValueError("vmin must be less than vmax")
+
+# Colormap index values through a LUT; NaN/inf become transparent
+def apply_lut(values,lut,vmin,vmax):
+    values = np.asarray(values,dtype=np.float64)
+    finite = np.isfinite(values)
+    scaled = (np.where(finite,values,vmin)-vmin)*(255.0/(vmax-vmin))
+    codes = np.clip(scaled,0,255).astype(np.uint8)
+    rgba = lut[codes]
+    rgba[~finite] = 0
+    return rgba
+
+# Minimal PNG encoder for an RGBA uint8 image
+def encode_png(rgba,level=6):
+    h, w = rgba.shape[:2]
+    raw = np.empty((h,w*4+1),dtype=np.uint8)
+    raw[:,0] = 0
+    raw[:,1:] = rgba.reshape(h,w*4)
+
+    def chunk(tag,data):
+        return (struct.pack('>I',len(data))+tag+data+
+                struct.pack('>I',zlib.crc32(tag+data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'+
+            chunk(b'IHDR',struct.pack('>IIBBBBB',w,h,8,6,0,0,0))+
+            chunk(b'IDAT',zlib.compress(raw.tobytes(),level))+
+            chunk(b'IEND',b''))
+
+# Thread-safe LRU of rendered tiles with an optional on-disk cache
+class TileCache:
+
+    def __init__(self,maxsize=1024,cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Keys start with (scene, index); tiles are filed per scene and index
+    def _path(self,key):
+        scene, index = (str(k).replace(os.sep,'_') for k in key[:2])
+        name = '_'.join(str(k) for k in key[1:]).replace(os.sep,'_')
+        return os.path.join(self.cache_dir,scene,index,name+'.png')
+
+    def get(self,key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+        if self.cache_dir is not None:
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path,'rb') as f:
+                    tile = f.read()
+                self.put(key,tile,write=False)
+                with self._lock:
+                    self.hits += 1
+                return tile
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self,key,tile,write=True):
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.maxsize:
+                self._tiles.popitem(last=False)
+        if write and self.cache_dir is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            tmp = path+'.%d.tmp' % threading.get_ident()
+            with open(tmp,'wb') as f:
+                f.write(tile)
+            os.replace(tmp,path)
+
+# Identifier of a scene for the disk cache: a digest of the band names,
+# shapes and dtypes, and of each source's file (path, offset and mtime) for
+# file-backed bands such as numpy.memmap or h5py datasets, or of its pixel
+# values for in-memory bands
+def scene_fingerprint(bands,tile=1024):
+    digest = hashlib.sha1()
+    for name in sorted(bands):
+        src = bands[name]
+        digest.update(repr((name,tuple(src.shape),str(getattr(src,'dtype','')))).encode('utf-8'))
+        path = getattr(src,'filename',None) or getattr(getattr(src,'file',None),'filename',None)
+        if isinstance(path,str) and os.path.exists(path):
+            digest.update(repr((os.path.abspath(path),getattr(src,'offset',0),getattr(src,'name',None),
+                                os.path.getmtime(path))).encode('utf-8'))
+        else:
+            for window in iter_windows(src.shape,tile):
+                digest.update(np.ascontiguousarray(src[window]).tobytes())
+    return digest.hexdigest()[:16]
+
+# Render index tiles on demand from 2-D band sources keyed by band name;
+# `scene` names the scene in the disk cache (by default a fingerprint of the
+# bands, so renderers of different scenes can share one cache_dir)
+class TileRenderer:
+
+    def __init__(self,bands,tile_size=256,cache_size=1024,cache_dir=None,dtype=np.float32,scene=None):
+        self.bands = bands
+        if scene is None and cache_dir is not None:
+            scene = scene_fingerprint(bands)
+        self.scene = scene
+        self.shape = next(iter(bands.values())).shape
+        self.tile_size = tile_size
+        self.dtype = dtype
+        self.max_zoom = max(0,int(math.ceil(math.log2(max(self.shape)/float(tile_size)))))
+        self.cache = TileCache(cache_size,cache_dir)
+        self._luts = {}
+        self._cited = set()
+        self._lock = threading.Lock()
+
+    # Indices that can be computed from the available bands
+    def indices(self):
+        names = [n for n,f in vars(Npvi).items() if isinstance(f,staticmethod)]
+        return [n for n in names if set(index_bands(getattr(Npvi,n))) <= set(self.bands)]
+
+    def _lut(self,cmap):
+        lut = self._luts.get(cmap)
+        if lut is None:
+            lut = self._luts[cmap] = colormap_lut(cmap)
+        return lut
+
+    # Pixel window and decimation step of tile (z, x, y)
+    def window(self,z,x,y):
+        if not 0 <= z <= self.max_zoom:
+            return None
+        step = 2**(self.max_zoom-z)
+        span = self.tile_size*step
+        r0, c0 = y*span, x*span
+        if x < 0 or y < 0 or r0 >= self.shape[0] or c0 >= self.shape[1]:
+            return None
+        return (slice(r0,min(r0+span,self.shape[0]),step),
+                slice(c0,min(c0+span,self.shape[1]),step))
+
+    # Index values of tile (z, x, y), NaN-padded to tile_size; `params` holds
+    # the index keyword arguments (e.g. {'x':0.1} for TSAVI)
+    def values(self,index,z,x,y,params=None):
+        func = resolve_index(index)
+        window = self.window(z,x,y)
+        if window is None:
+            return None
+        names = index_bands(func)
+        tile = {n:np.asarray(self.bands[n][window],dtype=self.dtype) for n in names}
+        with self._lock:
+            cite = func.__name__ not in self._cited
+            self._cited.add(func.__name__)
+        if cite:
+            cite_index(func,params)
+        result = evaluate_index(func,tile,params)
+        out = np.full((self.tile_size,self.tile_size),np.nan,dtype=self.dtype)
+        out[:result.shape[0],:result.shape[1]] = result
+        return out
+
+    # PNG bytes of tile (z, x, y), or None if outside the pyramid
+    def render(self,index,z,x,y,cmap='rdylgn',vmin=None,vmax=None,params=None):
+        name = resolve_index(index).__name__
+        params = params or {}
+        if vmin is None or vmax is None:
+            lo, hi = INDEX_RANGES.get(name,(-1.0,1.0))
+            vmin = lo if vmin is None else vmin
+            vmax = hi if vmax is None else vmax
+        vmin, vmax = float(vmin), float(vmax)
+        check_stretch(vmin,vmax)
+        key = (self.scene,name,z,x,y,cmap,vmin,vmax)+tuple(sorted(params.items()))
+        tile = self.cache.get(key)
+        if tile is not None:
+            return tile
+        values = self.values(name,z,x,y,params)
+        if values is None:
+            return None
+        tile = encode_png(apply_lut(values,self._lut(cmap),vmin,vmax))
+        self.cache.put(key,tile)
+        return tile
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+
+    renderer = None
+
+    def _send(self,status,body,content_type):
+        self.send_response(status)
+        self.send_header('Content-Type',content_type)
+        self.send_header('Content-Length',str(len(body)))
+        self.send_header('Access-Control-Allow-Origin','*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self,status,message):
+        self._send(status,json.dumps({'error':message}).encode('utf-8'),'application/json')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        renderer = self.renderer
+        if not parts:
+            info = {'scene':renderer.scene,'shape':list(renderer.shape),'tile_size':renderer.tile_size,
+                    'max_zoom':renderer.max_zoom,'indices':renderer.indices(),
+                    'colormaps':sorted(COLORMAPS),'tiles':'/{index}/{z}/{x}/{y}.png'}
+            return self._send(200,json.dumps(info).encode('utf-8'),'application/json')
+        if len(parts) != 4 or not parts[3].endswith('.png'):
+            return self._error(404,'expected /{index}/{z}/{x}/{y}.png')
+        index = parts[0].lower()
+        if index not in renderer.indices():
+            return self._error(404,'index %r is not available' % index)
+        try:
+            z, x, y = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+            query = {k:v[-1] for k,v in parse_qs(url.query).items()}
+            cmap = query.pop('cmap','rdylgn')
+            vmin = float(query.pop('vmin')) if 'vmin' in query else None
+            vmax = float(query.pop('vmax')) if 'vmax' in query else None
+            if vmin is not None or vmax is not None:
+                lo, hi = INDEX_RANGES.get(index,(-1.0,1.0))
+                check_stretch(lo if vmin is None else vmin,hi if vmax is None else vmax)
+            params = {k:float(v) for k,v in query.items()}
+            tile = renderer.render(index,z,x,y,cmap,vmin,vmax,params)
+        except (TypeError,ValueError) as e:
+            return self._error(400,str(e))
+        if tile is None:
+            return self._error(404,'tile outside the scene')
+        self._send(200,tile,'image/png')
+
+    def log_message(self,format,*args):
+        pass
+
+# HTTP server bound to a TileRenderer; call serve_forever() to run it
+def make_server(bands,host='127.0.0.1',port=8000,**kwargs):
+    renderer = bands if isinstance(bands,TileRenderer) else TileRenderer(bands,**kwargs)
+    handler = type('Handler',(TileRequestHandler,),{'renderer':renderer})
+    return ThreadingHTTPServer((host,port),handler)
+
+# Run the tile server until interrupted
+def serve(bands,host='127.0.0.1',port=8000,**kwargs):
+    server = make_server(bands,host,port,**kwargs)
+    print("Serving vegetation index tiles on http://%s:%d/" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
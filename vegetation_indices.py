@@ -11,10 +11,21 @@ Version 3.0
 
 """
 
+import inspect
+from collections import namedtuple
 import numpy as np
-import scipy as sp
 import ee
 
+# Array namespace of the inputs (Python array API standard), NumPy by default
+def array_namespace(*arrays):
+    for x in arrays:
+        if hasattr(x,'__array_namespace__'):
+            return x.__array_namespace__()
+        if type(x).__module__.split('.')[0] in ('jax','jaxlib'):
+            import jax.numpy as jnp
+            return jnp
+    return np
+
 # Google Earth Engine-based Vegetation Indices (GEEVI) class
 class Geevi:
     
@@ -445,6 +456,229 @@ class Geevi:
               "In: Freden, S.C., Mercanti, E.P., Becker, M.A. (Eds.), "+
               "Third Earth Resources Technology Satellite-1 Symposium, NASA SP-351 I, Washington, DC, 309-317.")
         return tvi_eq
+    
+    # Zonal time series of several indices for all images and regions
+    # Builds one combined graph (indices stacked per image, reduceRegions per
+    # image, flattened over the collection) and fetches the resulting table
+    # in pages of `page_size` rows, so only ceil(rows/page_size) getInfo
+    # requests are made. `band_map` maps index band names to image bands,
+    # e.g. {'red':'B4','nir':'B8'}; `params` maps index names to keyword
+    # arguments. Returns a list of dicts (feature properties, 'image',
+    # 'date' and one column per index band, e.g. 'NDVI'). Index names are
+    # case-insensitive.
+    @staticmethod
+    def zonal_timeseries(collection,features,band_map,indices,reducer=None,scale=None,params=None,page_size=5000):
+        reducer = reducer if reducer is not None else ee.Reducer.mean()
+        params = {str(k).lower():v for k,v in (params or {}).items()}
+        features = ee.FeatureCollection(features)
+        funcs = []
+        for name in indices:
+            key = str(name).lower()
+            func = getattr(Geevi,key,None)
+            if func is None or key == 'zonal_timeseries':
+                raise ValueError("Unknown vegetation index: %r" % (name,))
+            bands = [p.name for p in inspect.signature(func).parameters.values() if p.default is p.empty]
+            missing = [b for b in bands if b not in band_map]
+            if missing:
+                raise ValueError("band_map lacks %s needed by %s" % (missing,key))
+            funcs.append((func,bands,params.get(key,{})))
+        def reduce_image(image):
+            stack = ee.Image.cat([func(*[image.select(band_map[b]) for b in bands],**kwargs)
+                                  for func,bands,kwargs in funcs])
+            reduced = stack.reduceRegions(collection=features,reducer=reducer,scale=scale)
+            image_id = image.get('system:index')
+            date = image.date().format('YYYY-MM-dd')
+            return reduced.map(lambda f: ee.Feature(None,f.toDictionary()).set('image',image_id,'date',date))
+        table = ee.FeatureCollection(ee.ImageCollection(collection).map(reduce_image)).flatten()
+        # The first request also returns the row count, so no page is wasted
+        first = ee.Dictionary({'total':table.size(),
+                               'page':ee.FeatureCollection(table.toList(page_size,0))}).getInfo()
+        pages = [first['page']]
+        for offset in range(page_size,int(first['total']),page_size):
+            pages.append(ee.FeatureCollection(table.toList(page_size,offset)).getInfo())
+        return [f.get('properties',{}) for page in pages for f in page.get('features',[])]
+
+# Array API-based Vegetation Indices (XPVI) class
+# Pure formulas without printing; operations dispatch to the namespace of the
+# input arrays (NumPy, JAX, CuPy, ...), so they can be traced and jit-compiled
+class Xpvi:
+    
+    # Difference Vegetation Index (DVI)
+    @staticmethod
+    def dvi(red,nir):
+        return nir - red
+    
+    # Weighted Difference Vegetation Index (WDVI)
+    @staticmethod
+    def wdvi(red,nir,a=0.46):
+        return nir - a*red
+    
+    # Ratio Vegetation Index (RVI)
+    @staticmethod
+    def rvi(red,nir):
+        return nir / red
+    
+    # Normalized Difference Vegetation Index (NDVI)
+    @staticmethod
+    def ndvi(red,nir):
+        return (nir-red)/(nir+red)
+    
+    # Renormalized Difference Vegetation Index (RDVI)
+    @staticmethod
+    def rdvi(red,nir):
+        xp = array_namespace(red,nir)
+        return (nir-red)/xp.sqrt(nir+red)*0.5
+    
+    # Soil Adjusted Vegetation Index (SAVI)
+    @staticmethod
+    def savi(red,nir,l=0.5):
+        return ((nir-red)/(nir+red+l))*(1+l)
+    
+    # Transformed Soil Adjusted Vegetation Index (TSAVI)
+    @staticmethod
+    def tsavi(red,nir,a=0.5,s=0.5,x=0.08):
+        return (s*(nir-s*red-a))/(s*nir+red-a*s+x*(1+s**2))
+    
+    # Modified Soil Adjusted Vegetation Index (MSAVI)
+    @staticmethod
+    def msavi(red,nir,s=0.5,a=0.46):
+        ndvi = (nir-red)/(nir+red)
+        wdvi = nir - a*red
+        l = 1 - 2 * s * ndvi * wdvi
+        return ((1+l)*(nir-red))/(nir+red+l)
+    
+    # Optimized Soil Adjusted Vegetation Index (OSAVI)
+    @staticmethod
+    def osavi(red,nir,y=0.16):
+        return ((1+y)*(nir-red))/(nir+red+y)
+    
+    # Perpendicular Vegetation Index (PVI)
+    @staticmethod
+    def pvi(red,nir):
+        xp = array_namespace(red,nir)
+        return (nir-red)/(0.5*xp.sqrt(nir+red))
+    
+    # Infrared Percentage Vegetation Index (IPVI)
+    @staticmethod
+    def ipvi(red,nir):
+        return nir/(nir+red)
+    
+    # Transformed Normalized Difference Vegetation Index (TNDVI)
+    @staticmethod
+    def tndvi(red,nir):
+        xp = array_namespace(red,nir)
+        return xp.sqrt(((nir-red)/(nir+red))+0.5)
+    
+    # Green Difference Vegetation Index (GDVI)
+    @staticmethod
+    def gdvi(green,nir):
+        return nir - green
+    
+    # Green Normalized Difference Vegetation Index (GNDVI)
+    @staticmethod
+    def gndvi(green,nir):
+        return (nir-green)/(nir+green)
+    
+    # Global Environmental Monitoring Index (GEMI)
+    @staticmethod
+    def gemi(red,nir):
+        eta = (2*(nir**2-red**2)+1.5*nir+0.5*red)/(nir+red+0.5)
+        return eta*(1-0.25*eta)-((red-0.125)/(1-red))
+    
+    # Atmospherically Resistant Vegetation Index (ARVI)
+    @staticmethod
+    def arvi(blue,red,nir):
+        return (nir-(2*red-blue))/(nir+(2*red-blue))
+    
+    # Normalized Difference Index 45 (NDI45)
+    @staticmethod
+    def ndi45(red,re1):
+        return (re1-red)/(re1+red)
+    
+    # Modified Chlorophyll Absorption Reflectance Index (MCARI)
+    @staticmethod
+    def mcari(green,red,re1):
+        return ((re1-red)-0.2*(re1-green))*(re1/red)
+    
+    # Enhanced Vegetation Index (EVI)
+    @staticmethod
+    def evi(blue,red,nir):
+        return 2.5*((nir-red)/(nir+6*red-7.5*blue+1))
+    
+    # Sentinel-2 Red-Edge Position Index (S2REP)
+    @staticmethod
+    def s2rep(red,re1,re2,re3):
+        return 705+35*(((red+re3)/2-re1)/(re2-re1))
+    
+    # Inverted Red-Edge Chlorophyll Index (IRECI)
+    @staticmethod
+    def ireci(red,re1,re2,re3):
+        return (re3-red)/(re1/re2)
+    
+    # Pigment Specific Simple Ratio (PSSRa)
+    @staticmethod
+    def pssra(red,re):
+        return re/red
+    
+    # Anthocyanin Reflectance Index (ARI)
+    @staticmethod
+    def ari(green,re1):
+        return 1/green - 1/re1
+    
+    # Green Leaf Index (GLI)
+    @staticmethod
+    def gli(blue,green,red):
+        return (2*green-red-blue)/(2*green+red+blue)
+    
+    # Leaf Chlorophyll Index (LCI)
+    @staticmethod
+    def lci(red,re1,nir):
+        return (nir-re1)/(nir-red)
+    
+    # Chlorophyll Vegetation Index (CVI)
+    @staticmethod
+    def cvi(green,red,nir):
+        return (nir*red)/green**2
+    
+    # Carotenoid Reflectance Index 550 nm (CRI550)
+    @staticmethod
+    def cri550(blue,green):
+        return 1/blue - 1/green
+    
+    # Carotenoid Reflectance Index 700 nm (CRI700)
+    @staticmethod
+    def cri700(blue,re1):
+        return 1/blue - 1/re1
+    
+    # Canopy Chlorophyll Content Index (CCCI)
+    @staticmethod
+    def ccci(red,re1,nir):
+        return ((nir-re1)/(nir+re1))/((nir-red)/(nir+red))
+    
+    # Transformed Vegetation Index (TVI)
+    @staticmethod
+    def tvi(red,nir):
+        xp = array_namespace(red,nir)
+        return xp.sqrt(((nir-red)/(nir+red))+0.5)
+    
+    # Pure function of band keyword arguments returning a dict of several
+    # indices, e.g. jax.jit(Xpvi.multi(['ndvi','evi'])) compiles them as one
+    # fused program; `params` maps index names to their keyword arguments
+    # (names are case-insensitive)
+    @staticmethod
+    def multi(indices,params=None):
+        params = {str(k).lower():v for k,v in (params or {}).items()}
+        funcs = []
+        for name in indices:
+            key = str(name).lower()
+            func = getattr(Xpvi,key,None)
+            if func is None or key == 'multi':
+                raise ValueError("Unknown vegetation index: %r" % (name,))
+            bands = [p.name for p in inspect.signature(func).parameters.values() if p.default is p.empty]
+            funcs.append((key,func,bands,params.get(key,{})))
+        def compute(**bands):
+            return {name:func(*[bands[b] for b in args],**kwargs) for name,func,args,kwargs in funcs}
+        return compute
 
 # NumPy-based Vegetation Indices (NPVI) class
 class Npvi:
@@ -452,7 +686,7 @@ class Npvi:
     # Difference Vegetation Index (DVI)
     @staticmethod
     def dvi(red,nir):
-        dvi_eq = nir - red
+        dvi_eq = Xpvi.dvi(red,nir)
         print("------------------------------------------------------------------------------")
         print("You are using Difference Vegetation Index (DVI) (Richardson and Wiegand, 1977)")
         print("------------------------------------------------------------------------------")
@@ -465,7 +699,7 @@ class Npvi:
     # Weighted Difference Vegetation Index (WDVI)
     @staticmethod
     def wdvi(red,nir,a=0.46):
-        wdvi_eq = nir - a*red
+        wdvi_eq = Xpvi.wdvi(red,nir,a)
         print("-------------------------------------------------------------------------")
         print("You are using Weighted Difference Vegetation Index (WDVI) (Clevers, 1991)")
         print("-------------------------------------------------------------------------")
@@ -479,7 +713,7 @@ class Npvi:
     # Ratio Vegetation Index (RVI)
     @staticmethod
     def rvi(red,nir):
-        rvi_eq = nir / red
+        rvi_eq = Xpvi.rvi(red,nir)
         print("---------------------------------------------------------------")
         print("You are using Ratio Vegetation Index (RVI) (Major et al., 1990)")
         print("---------------------------------------------------------------")
@@ -493,7 +727,7 @@ class Npvi:
     # Normalized Difference Vegetation Index (NDVI)
     @staticmethod
     def ndvi(red,nir):
-        ndvi_eq = (nir-red)/(nir+red)
+        ndvi_eq = Xpvi.ndvi(red,nir)
         print("--------------------------------------------------------------------------------")
         print("You are using Normalized Difference Vegetation Index (NDVI) (Rouse et al., 1974)")
         print("--------------------------------------------------------------------------------")
@@ -507,7 +741,7 @@ class Npvi:
     # Renormalized Difference Vegetation Index (RDVI)
     @staticmethod
     def rdvi(red,nir):
-        rdvi_eq = (nir-red)/np.sqrt(nir+red)*0.5
+        rdvi_eq = Xpvi.rdvi(red,nir)
         print("---------------------------------------------------------------------------------------")
         print("You are using Renormalized Difference Vegetation Index (RDVI) (Broge and Leblanc, 2001)")
         print("---------------------------------------------------------------------------------------")
@@ -521,7 +755,7 @@ class Npvi:
     # Soil Adjusted Vegetation Index (SAVI)
     @staticmethod
     def savi(red,nir,l=0.5):
-        savi_eq = ((nir-red)/(nir+red+l))*(1+l)
+        savi_eq = Xpvi.savi(red,nir,l)
         print("-----------------------------------------------------------------")
         print("You are using Soil Adjusted Vegetation Index (SAVI) (Huete, 1988)")
         print("-----------------------------------------------------------------")
@@ -535,7 +769,7 @@ class Npvi:
     # Transformed Soil Adjusted Vegetation Index (TSAVI)
     @staticmethod
     def tsavi(red,nir,a=0.5,s=0.5,x=0.08):
-        tsavi_eq = (s*(nir-s*red-a))/(s*nir+red-a*s+x*(1+s**2))
+        tsavi_eq = Xpvi.tsavi(red,nir,a,s,x)
         print("----------------------------------------------------------------------------------------")
         print("You are using Transformed Soil Adjusted Vegetation Index (TSAVI) (Baret and Guyot, 1991)")
         print("----------------------------------------------------------------------------------------")
@@ -549,10 +783,7 @@ class Npvi:
     # Modified Soil Adjusted Vegetation Index (MSAVI)
     @staticmethod
     def msavi(red,nir,s=0.5,a=0.46):
-        ndvi = (nir-red)/(nir+red)
-        wdvi = nir - a*red
-        l = 1 - 2 * s * ndvi * wdvi
-        msavi_eq = ((1+l)*(nir-red))/(nir+red+l)
+        msavi_eq = Xpvi.msavi(red,nir,s,a)
         print("-------------------------------------------------------------------------------")
         print("You are using Modified Soil Adjusted Vegetation Index (MSAVI) (Qi et al., 1994)")
         print("-------------------------------------------------------------------------------")
@@ -566,7 +797,7 @@ class Npvi:
     # Optimized Soil Adjusted Vegetation Index (OSAVI)
     @staticmethod
     def osavi(red,nir,y=0.16):
-        osavi_eq = ((1+y)*(nir-red))/(nir+red+y)
+        osavi_eq = Xpvi.osavi(red,nir,y)
         print("--------------------------------------------------------------------------------------------------------------")
         print("You are using Optimized Soil Adjusted Vegetation Index (OSAVI) (Rondeaux et al., 1996; Haboudane et al., 2002)")
         print("--------------------------------------------------------------------------------------------------------------")
@@ -584,7 +815,7 @@ class Npvi:
     # Perpendicular Vegetation Index (PVI)
     @staticmethod
     def pvi(red,nir):
-        pvi_eq = (nir-red)/(0.5*np.sqrt(nir+red))
+        pvi_eq = Xpvi.pvi(red,nir)
         print("---------------------------------------------------------------------------------")
         print("You are using Perpendicular Vegetation Index (PVI) (Richardson and Wiegand, 1977)")
         print("---------------------------------------------------------------------------------")
@@ -597,7 +828,7 @@ class Npvi:
     # Infrared Percentage Vegetation Index (IPVI)
     @staticmethod
     def ipvi(red,nir):
-        ipvi_eq = nir/(nir+red)
+        ipvi_eq = Xpvi.ipvi(red,nir)
         print("-------------------------------------------------------------------------")
         print("You are using Infrared Percentage Vegetation Index (IPVI) (Crippen, 1990)")
         print("-------------------------------------------------------------------------")
@@ -611,7 +842,7 @@ class Npvi:
     # Transformed Normalized Difference Vegetation Index (TNDVI)
     @staticmethod
     def tndvi(red,nir):
-        tndvi_eq = np.sqrt(((nir-red)/(nir+red))+0.5)
+        tndvi_eq = Xpvi.tndvi(red,nir)
         print("------------------------------------------------------------------------------------------------")
         print("You are using Transformed Normalized Difference Vegetation Index (TNDVI) (Senseman et al., 1996)")
         print("------------------------------------------------------------------------------------------------")
@@ -625,7 +856,7 @@ class Npvi:
     # Green Difference Vegetation Index (GDVI)
     @staticmethod
     def gdvi(green,nir):
-        gdvi_eq = nir - green
+        gdvi_eq = Xpvi.gdvi(green,nir)
         print("----------------------------------------------------------------------------")
         print("You are using Green Difference Vegetation Index (GDVI) (Tucker et al., 1979)")
         print("----------------------------------------------------------------------------")
@@ -639,7 +870,7 @@ class Npvi:
     # Green Normalized Difference Vegetation Index (GNDVI)
     @staticmethod
     def gndvi(green,nir):
-        gndvi_eq = (nir-green)/(nir+green)
+        gndvi_eq = Xpvi.gndvi(green,nir)
         print("------------------------------------------------------------------------------------------")
         print("You are using Green Normalized Difference Vegetation Index (GNDVI) (Gitelson et al., 1996)")
         print("------------------------------------------------------------------------------------------")
@@ -653,8 +884,7 @@ class Npvi:
     # Global Environmental Monitoring Index (GEMI)
     @staticmethod
     def gemi(red,nir):
-        eta = (2*(nir**2-red**2)+1.5*nir+0.5*red)/(nir+red+0.5)
-        gemi_eq = eta*(1-0.25*eta)-((red-0.125)/(1-red))
+        gemi_eq = Xpvi.gemi(red,nir)
         print("---------------------------------------------------------------------------------------")
         print("You are using Global Environmental Monitoring Index (GEMI) (Pinty and Verstraete, 1992)")
         print("---------------------------------------------------------------------------------------")
@@ -668,7 +898,7 @@ class Npvi:
     # Atmospherically Resistant Vegetation Index (ARVI)
     @staticmethod
     def arvi(blue,red,nir):
-        arvi_eq = (nir-(2*red-blue))/(nir+(2*red-blue))
+        arvi_eq = Xpvi.arvi(blue,red,nir)
         print("-----------------------------------------------------------------------------------------")
         print("You are using Atmospherically Resistant Vegetation Index (ARVI) (Kaufman and Tanre, 1992)")
         print("-----------------------------------------------------------------------------------------")
@@ -682,7 +912,7 @@ class Npvi:
     # Normalized Difference Index 45 (NDI45)
     @staticmethod
     def ndi45(red,re1):
-        ndi45_eq = (re1-red)/(re1+red)
+        ndi45_eq = Xpvi.ndi45(red,re1)
         print("----------------------------------------------------------------------------")
         print("You are using Normalized Difference Index 45 (NDI45) (Delegido et al., 2011)")
         print("----------------------------------------------------------------------------")
@@ -696,7 +926,7 @@ class Npvi:
     # Modified Chlorophyll Absorption Reflectance Index (MCARI)
     @staticmethod
     def mcari(green,red,re1):
-        mcari_eq = ((re1-red)-0.2*(re1-green))*(re1/red)
+        mcari_eq = Xpvi.mcari(green,red,re1)
         print("-----------------------------------------------------------------------------------------------")
         print("You are using Modified Chlorophyll Absorption Reflectance Index (MCARI) (Daughtry et al., 2000)")
         print("-----------------------------------------------------------------------------------------------")
@@ -710,7 +940,7 @@ class Npvi:
     # Enhanced Vegetation Index (EVI)
     @staticmethod
     def evi(blue,red,nir):
-        evi_eq = 2.5*((nir-red)/(nir+6*red-7.5*blue+1))
+        evi_eq = Xpvi.evi(blue,red,nir)
         print("-------------------------------------------------------------------")
         print("You are using Enhanced Vegetation Index (EVI) (Huete et. al., 2002)")
         print("-------------------------------------------------------------------")
@@ -724,7 +954,7 @@ class Npvi:
     # Sentinel-2 Red-Edge Position Index (S2REP)
     @staticmethod
     def s2rep(red,re1,re2,re3):
-        s2rep_eq = 705+35*(((red+re3)/2-re1)/(re2-re1))
+        s2rep_eq = Xpvi.s2rep(red,re1,re2,re3)
         print("--------------------------------------------------------------------------------")
         print("You are using Sentinel-2 Red-Edge Position Index (S2REP) (Guyot and Baret, 1988)")
         print("--------------------------------------------------------------------------------")
@@ -737,7 +967,7 @@ class Npvi:
     # Inverted Red-Edge Chlorophyll Index (IRECI)
     @staticmethod
     def ireci(red,re1,re2,re3):
-        ireci_eq = (re3-red)/(re1/re2)
+        ireci_eq = Xpvi.ireci(red,re1,re2,re3)
         print("---------------------------------------------------------------------------------")
         print("You are using Inverted Red-Edge Chlorophyll Index (IRECI) (Clevers et. al., 2000)")
         print("---------------------------------------------------------------------------------")
@@ -750,7 +980,7 @@ class Npvi:
     # Pigment Specific Simple Ratio (PSSRa)
     @staticmethod
     def pssra(red,re):
-        pssra_eq = re/red
+        pssra_eq = Xpvi.pssra(red,re)
         print("---------------------------------------------------------------------")
         print("You are using Pigment Specific Simple Ratio (PSSRa) (Blackburn, 1998)")
         print("---------------------------------------------------------------------")
@@ -764,7 +994,7 @@ class Npvi:
     # Anthocyanin Reflectance Index (ARI)
     @staticmethod
     def ari(green,re1):
-        ari_eq = 1/green - 1/re1
+        ari_eq = Xpvi.ari(green,re1)
         print("-------------------------------------------------------------------------")
         print("You are using Anthocyanin Reflectance Index (ARI) (Gitelson et al., 2009)")
         print("-------------------------------------------------------------------------")
@@ -778,7 +1008,7 @@ class Npvi:
     # Green Leaf Index (GLI)
     @staticmethod
     def gli(blue,green,red):
-        gli_eq = (2*green-red-blue)/(2*green+red+blue)
+        gli_eq = Xpvi.gli(blue,green,red)
         print("----------------------------------------------------------")
         print("You are using Green Leaf Index (GLI) (Gobron et al., 2000)")
         print("----------------------------------------------------------")
@@ -792,7 +1022,7 @@ class Npvi:
     # Leaf Chlorophyll Index (LCI)
     @staticmethod
     def lci(red,re1,nir):
-        lci_eq = (nir-re1)/(nir-red)
+        lci_eq = Xpvi.lci(red,re1,nir)
         print("---------------------------------------------------------------------")
         print("You are using Leaf Chlorophyll Index (LCI) (Datt, 1999a; Datt, 1999b)")
         print("---------------------------------------------------------------------")
@@ -810,7 +1040,7 @@ class Npvi:
     # Chlorophyll Vegetation Index (CVI)
     @staticmethod
     def cvi(green,red,nir):
-        cvi_eq = (nir*red)/green**2
+        cvi_eq = Xpvi.cvi(green,red,nir)
         print("----------------------------------------------------------------------")
         print("You are using Chlorophyll Vegetation Index (CVI) (Gobron et al., 2000)")
         print("----------------------------------------------------------------------")
@@ -824,7 +1054,7 @@ class Npvi:
     # Carotenoid Reflectance Index 550 nm (CRI550)
     @staticmethod
     def cri550(blue,green):
-        cri550_eq = 1/blue - 1/green
+        cri550_eq = Xpvi.cri550(blue,green)
         print("----------------------------------------------------------------------------------")
         print("You are using Carotenoid Reflectance Index 550 nm (CRI550) (Gitelson et al., 2001)")
         print("----------------------------------------------------------------------------------")
@@ -838,7 +1068,7 @@ class Npvi:
     # Carotenoid Reflectance Index 700 nm (CRI700)
     @staticmethod
     def cri700(blue,re1):
-        cri700_eq = 1/blue - 1/re1
+        cri700_eq = Xpvi.cri700(blue,re1)
         print("----------------------------------------------------------------------------------")
         print("You are using Carotenoid Reflectance Index 700 nm (CRI700) (Merzlyak et al., 2003)")
         print("----------------------------------------------------------------------------------")
@@ -852,7 +1082,7 @@ class Npvi:
     # Canopy Chlorophyll Content Index (CCCI)
     @staticmethod
     def ccci(red,re1,nir):
-        ccci_eq = ((nir-re1)/(nir+re1))/((nir-red)/(nir+red))
+        ccci_eq = Xpvi.ccci(red,re1,nir)
         print("------------------------------------------------------------------------------")
         print("You are using Canopy Chlorophyll Content Index (CCCI) (El-Shikha et al., 2008)")
         print("------------------------------------------------------------------------------")
@@ -866,7 +1096,7 @@ class Npvi:
     # Transformed Vegetation Index (TVI)
     @staticmethod
     def tvi(red,nir):
-        tvi_eq = np.sqrt(((nir-red)/(nir+red))+0.5)
+        tvi_eq = Xpvi.tvi(red,nir)
         print("---------------------------------------------------------------------")
         print("You are using Transformed Vegetation Index (TVI) (Rouse et al., 1974)")
         print("---------------------------------------------------------------------")
@@ -876,3 +1106,50 @@ class Npvi:
               "In: Freden, S.C., Mercanti, E.P., Becker, M.A. (Eds.), "+
               "Third Earth Resources Technology Satellite-1 Symposium, NASA SP-351 I, Washington, DC, 309-317.")
         return tvi_eq
+
+# Index validity metadata
+# valid_range: expected range on surface reflectance in [0, 1] (open-ended
+# ratio indices use a practical range); denominators: (expression, function)
+# pairs that take the same arguments as the index and blow the index up when
+# they approach zero
+IndexInfo = namedtuple('IndexInfo',['valid_range','denominators'])
+
+INDEX_INFO = {
+    'dvi':IndexInfo((-1.0,1.0),()),
+    'wdvi':IndexInfo((-1.0,1.0),()),
+    'rvi':IndexInfo((0.0,30.0),(('red',lambda red,nir:red),)),
+    'ndvi':IndexInfo((-1.0,1.0),(('nir+red',lambda red,nir:nir+red),)),
+    'rdvi':IndexInfo((-1.0,1.0),(('nir+red',lambda red,nir:nir+red),)),
+    'savi':IndexInfo((-1.0,1.0),(('nir+red+l',lambda red,nir,l=0.5:nir+red+l),)),
+    'tsavi':IndexInfo((-1.0,1.0),(('s*nir+red-a*s+x*(1+s**2)',lambda red,nir,a=0.5,s=0.5,x=0.08:s*nir+red-a*s+x*(1+s**2)),)),
+    'msavi':IndexInfo((-1.0,1.0),(('nir+red',lambda red,nir,s=0.5,a=0.46:nir+red),)),
+    'osavi':IndexInfo((-1.0,1.0),(('nir+red+y',lambda red,nir,y=0.16:nir+red+y),)),
+    'pvi':IndexInfo((-2.0,2.0),(('nir+red',lambda red,nir:nir+red),)),
+    'ipvi':IndexInfo((0.0,1.0),(('nir+red',lambda red,nir:nir+red),)),
+    'tndvi':IndexInfo((0.0,1.25),(('nir+red',lambda red,nir:nir+red),)),
+    'gdvi':IndexInfo((-1.0,1.0),()),
+    'gndvi':IndexInfo((-1.0,1.0),(('nir+green',lambda green,nir:nir+green),)),
+    'gemi':IndexInfo((-1.0,1.0),(('nir+red+0.5',lambda red,nir:nir+red+0.5),
+                                 ('1-red',lambda red,nir:1-red))),
+    'arvi':IndexInfo((-1.0,1.0),(('nir+(2*red-blue)',lambda blue,red,nir:nir+(2*red-blue)),)),
+    'ndi45':IndexInfo((-1.0,1.0),(('re1+red',lambda red,re1:re1+red),)),
+    'mcari':IndexInfo((-1.0,5.0),(('red',lambda green,red,re1:red),)),
+    'evi':IndexInfo((-1.0,1.0),(('nir+6*red-7.5*blue+1',lambda blue,red,nir:nir+6*red-7.5*blue+1),)),
+    's2rep':IndexInfo((680.0,780.0),(('re2-re1',lambda red,re1,re2,re3:re2-re1),)),
+    'ireci':IndexInfo((0.0,5.0),(('re1/re2',lambda red,re1,re2,re3:re1/re2),
+                                 ('re2',lambda red,re1,re2,re3:re2))),
+    'pssra':IndexInfo((0.0,30.0),(('red',lambda red,re:red),)),
+    'ari':IndexInfo((-50.0,50.0),(('green',lambda green,re1:green),
+                                  ('re1',lambda green,re1:re1))),
+    'gli':IndexInfo((-1.0,1.0),(('2*green+red+blue',lambda blue,green,red:2*green+red+blue),)),
+    'lci':IndexInfo((-5.0,5.0),(('nir-red',lambda red,re1,nir:nir-red),)),
+    'cvi':IndexInfo((0.0,30.0),(('green**2',lambda green,red,nir:green**2),)),
+    'cri550':IndexInfo((-50.0,50.0),(('blue',lambda blue,green:blue),
+                                     ('green',lambda blue,green:green))),
+    'cri700':IndexInfo((-50.0,50.0),(('blue',lambda blue,re1:blue),
+                                     ('re1',lambda blue,re1:re1))),
+    'ccci':IndexInfo((-2.0,2.0),(('nir+re1',lambda red,re1,nir:nir+re1),
+                                 ('nir+red',lambda red,re1,nir:nir+red),
+                                 ('nir-red',lambda red,re1,nir:nir-red))),
+    'tvi':IndexInfo((0.0,1.25),(('nir+red',lambda red,nir:nir+red),)),
+}